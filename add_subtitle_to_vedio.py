@@ -2,21 +2,264 @@ import subprocess
 import os
 import sys
 import json
-import whisper
 
 
 
+def load_word_timings(word_timings_file):
+    """
+    Loads the per-word timings written by generate_audio.
+    Returns a list of {"word", "start", "end"} or None if unavailable.
+    """
+    if not word_timings_file or not os.path.exists(word_timings_file):
+        return None
+
+    with open(word_timings_file, "r", encoding="utf-8") as f:
+        words = json.load(f)
+
+    return words or None
+
+
+def transcribe_words(audio_path, whisper_model="base", language="en"):
+    """
+    Fallback: recovers word timings by running Whisper on the audio.
+    Uses the resident whisper_server when one is running, otherwise loads
+    the model in-process (cached for the next call).
+    Returns a list of {"word", "start", "end"}.
+    """
+    from whisper_server import transcribe_via_server, transcribe_local
+
+    words = transcribe_via_server(audio_path, whisper_model, language)
+    if words is not None:
+        return words
+
+    # ------------------ TRANSCRIPTION ------------------
+    print("🎙️ Transcribing audio with word-level timestamps...")
+    words = transcribe_local(audio_path, whisper_model, language)
+
+    print("✅ Transcription completed")
+
+    return words
+
+
+ASS_HEADER = """[Script Info]
+Title: TikTok Style Subtitles
+ScriptType: v4.00+
+WrapStyle: 0
+PlayResX: 1080
+PlayResY: 1920
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial Black,80,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,-1,0,0,0,100,100,0,0,1,4,0,5,10,10,80,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+SUBTITLE_MODES = ("burn", "soft")
+
+# Where caption words and timings come from:
+#   tts     - edge-tts word boundaries (falls back to align, then whisper)
+#   align   - the script, timed by a tiny Whisper model (caption_align)
+#   whisper - blind transcription with whisper_model
+CAPTION_SOURCES = ("tts", "align", "whisper")
+
+
+def seconds_to_ass_time(seconds: float) -> str:
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    centisecs = int((seconds % 1) * 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centisecs:02d}"
+
+
+def seconds_to_srt_time(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+class CaptionWriter:
+    """
+    Streams word-by-word captions to an ASS file (for burn-in) and/or an
+    SRT file (for a soft mov_text track), one line per word as it comes.
+
+        with CaptionWriter(ass_file="c.ass", srt_file="c.srt") as writer:
+            for w in words:
+                writer.write(w["word"], w["start"], w["end"])
+    """
+
+    def __init__(self, ass_file=None, srt_file=None):
+        if not ass_file and not srt_file:
+            raise ValueError("CaptionWriter needs an ASS and/or an SRT file")
+        self.ass_file = ass_file
+        self.srt_file = srt_file
+        self.count = 0
+        self._ass = None
+        self._srt = None
+
+    def __enter__(self):
+        if self.ass_file:
+            self._ass = open(self.ass_file, "w", encoding="utf-8")
+            self._ass.write(ASS_HEADER)
+        if self.srt_file:
+            self._srt = open(self.srt_file, "w", encoding="utf-8")
+        return self
+
+    def write(self, word, start, end):
+        word = word.strip()
+        if not word:
+            return
+        self.count += 1
+
+        if self._ass:
+            self._ass.write(
+                f"Dialogue: 0,"
+                f"{seconds_to_ass_time(start)},"
+                f"{seconds_to_ass_time(end)},"
+                f"Default,,0,0,0,,{word}\n"
+            )
+        if self._srt:
+            self._srt.write(
+                f"{self.count}\n"
+                f"{seconds_to_srt_time(start)} --> {seconds_to_srt_time(end)}\n"
+                f"{word}\n\n"
+            )
+
+    def __exit__(self, *exc):
+        for f in (self._ass, self._srt):
+            if f:
+                f.close()
+        return False
+
+
+def write_captions(words, ass_file=None, srt_file=None) -> int:
+    """
+    Writes TikTok-style word-by-word captions as ASS and/or SRT.
+    Returns the number of words written.
+    """
+    # ------------------ SUBTITLE CREATION ------------------
+    print("\n📝 Creating TikTok-style subtitle file...")
+
+    with CaptionWriter(ass_file, srt_file) as writer:
+        for word_info in words:
+            writer.write(word_info["word"], word_info["start"], word_info["end"])
+
+    for path in (ass_file, srt_file):
+        if path:
+            print(f"✅ Subtitle file created: {path}")
+    print(f"📝 Total words: {writer.count}")
+
+    return writer.count
+
+
+def write_ass_file(words, ass_file="tiktok_style.ass") -> int:
+    """
+    Writes a TikTok-style word-by-word ASS subtitle file.
+    Returns the number of words written.
+    """
+    return write_captions(words, ass_file=ass_file)
+
+
+def srt_path_for(ass_file) -> str:
+    """SRT file written next to the ASS file for the soft-subtitle mode."""
+    return os.path.splitext(ass_file)[0] + ".srt"
+
+
+def write_ass_subtitle(
+    audio_path="audio_reel.mp3",
+    ass_file="tiktok_style.ass",
+    whisper_model="base",
+    language="en",
+    word_timings_file=None,
+    srt_file=None,
+    caption_source="tts",
+    script=None
+) -> int:
+    """
+    Builds the ASS subtitle file (and/or the SRT file; pass ass_file=None
+    for SRT only). Words come from caption_source (see CAPTION_SOURCES):
+    the TTS word timings when available, else the script aligned to the
+    audio when the script is known, else Whisper transcription.
+    Returns the number of words written. Raises on failure.
+    """
+    if caption_source not in CAPTION_SOURCES:
+        raise ValueError(f"Unknown caption source: {caption_source}")
+
+    words = None
+    if caption_source == "tts":
+        words = load_word_timings(word_timings_file)
+        if words:
+            print(f"⏱️ Using TTS word timings from {word_timings_file} (Whisper skipped)")
+        else:
+            print("⚠️ No TTS word timings")
+
+    if not words and script and caption_source in ("tts", "align"):
+        from caption_align import align_captions
+        from utils import get_audio_duration
+        words = align_captions(audio_path, script, language,
+                               audio_end=get_audio_duration(audio_path))
+
+    if not words:
+        print("⚠️ Falling back to Whisper transcription")
+        words = transcribe_words(audio_path, whisper_model, language)
+
+    return write_captions(words, ass_file, srt_file)
+
+
+def create_ass_subtitle(
+    audio_path="audio_reel.mp3",
+    ass_file="tiktok_style.ass",
+    whisper_model="base",
+    language="en",
+    word_timings_file=None,
+    srt_file=None,
+    caption_source="tts",
+    script=None
+) -> bool:
+    """
+    Creates only the subtitle file(s), without touching any video.
+    Returns True if successful, False otherwise.
+    """
+
+    try:
+        if not os.path.exists(audio_path):
+            print(f"❌ Audio not found: {audio_path}")
+            return False
+
+        word_count = write_ass_subtitle(
+            audio_path, ass_file, whisper_model, language, word_timings_file,
+            srt_file, caption_source, script
+        )
+        return word_count > 0
+
+    except Exception as e:
+        print("🔥 Subtitle generation failed")
+        print(str(e))
+        return False
+
+
 def add_subtitle(
     video_path="vedio_with_audio.mp4",
     audio_path="audio_reel.mp3",
     output_path="final_vedio.mp4",
     ass_file="tiktok_style.ass",
     whisper_model="base",
-    language="en"
+    language="en",
+    word_timings_file=None,
+    subtitle_mode="burn",
+    caption_source="tts",
+    script=None
 ) -> bool:
     """
-    Creates TikTok-style word-by-word captions using Whisper
-    and burns them into the video.
+    Creates TikTok-style word-by-word captions (from TTS word timings,
+    the script aligned to the audio, or Whisper as a fallback) and burns
+    them into the video.
+    With subtitle_mode="soft" the captions are muxed as a mov_text track
+    instead and the video stream is copied (no encode).
     Returns True if successful, False otherwise.
     """
 
@@ -34,85 +277,52 @@ def add_subtitle(
             print(f"❌ Audio not found: {audio_path}")
             return False
 
-        # ------------------ WHISPER SETUP ------------------
-        print("\n🎤 Checking Whisper installation...")
-
-        
-
-        print(f"🧠 Loading Whisper model: {whisper_model}")
-        model = whisper.load_model(whisper_model)
-
-        # ------------------ TRANSCRIPTION ------------------
-        print("🎙️ Transcribing audio with word-level timestamps...")
-        result = model.transcribe(
-            audio_path,
-            word_timestamps=True,
-            language=language
-        )
-
-        print("✅ Transcription completed")
+        if subtitle_mode not in SUBTITLE_MODES:
+            print(f"❌ Unknown subtitle mode: {subtitle_mode}")
+            return False
 
-        # ------------------ ASS SUBTITLE CREATION ------------------
-        print("\n📝 Creating TikTok-style ASS subtitle file...")
+        if subtitle_mode == "soft":
+            srt_file = srt_path_for(ass_file)
+            word_count = write_ass_subtitle(
+                audio_path, None, whisper_model, language, word_timings_file,
+                srt_file, caption_source, script
+            )
 
-        ass_content = """[Script Info]
-Title: TikTok Style Subtitles
-ScriptType: v4.00+
-WrapStyle: 0
-PlayResX: 1080
-PlayResY: 1920
-ScaledBorderAndShadow: yes
+            # ------------------ MUX SUBTITLE TRACK ------------------
+            print("\n🎬 Muxing captions as a subtitle track (video copied)...")
 
-[V4+ Styles]
-Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
-Style: Default,Arial Black,80,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,-1,0,0,0,100,100,0,0,1,4,0,5,10,10,80,1
+            cmd = [
+                "ffmpeg", "-y",
+                "-i", video_path,
+                "-i", srt_file,
+                "-map", "0:v",
+                "-map", "0:a?",
+                "-map", "1:0",
+                "-c:v", "copy",
+                "-c:a", "copy",
+                "-c:s", "mov_text",
+                "-metadata:s:s:0", f"language={language}",
+                output_path
+            ]
+        else:
+            word_count = write_ass_subtitle(
+                audio_path, ass_file, whisper_model, language, word_timings_file,
+                None, caption_source, script
+            )
 
-[Events]
-Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
-"""
+            # ------------------ BURN SUBTITLES ------------------
+            print("\n🎬 Rendering video with burned-in captions...")
 
-        def seconds_to_ass_time(seconds: float) -> str:
-            hours = int(seconds // 3600)
-            minutes = int((seconds % 3600) // 60)
-            secs = int(seconds % 60)
-            centisecs = int((seconds % 1) * 100)
-            return f"{hours}:{minutes:02d}:{secs:02d}.{centisecs:02d}"
-
-        word_count = 0
-
-        for segment in result.get("segments", []):
-            for word_info in segment.get("words", []):
-                word = word_info["word"].strip()
-                start = word_info["start"]
-                end = word_info["end"]
-
-                ass_content += (
-                    f"Dialogue: 0,"
-                    f"{seconds_to_ass_time(start)},"
-                    f"{seconds_to_ass_time(end)},"
-                    f"Default,,0,0,0,,{word}\n"
-                )
-                word_count += 1
-
-        with open(ass_file, "w", encoding="utf-8") as f:
-            f.write(ass_content)
-
-        print(f"✅ Subtitle file created: {ass_file}")
-        print(f"📝 Total words: {word_count}")
-
-        # ------------------ BURN SUBTITLES ------------------
-        print("\n🎬 Rendering video with burned-in captions...")
-
-        cmd = [
-            "ffmpeg", "-y",
-            "-i", video_path,
-            "-vf", f"ass={ass_file}",
-            "-c:a", "copy",
-            "-c:v", "libx264",
-            "-preset", "medium",
-            "-crf", "23",
-            output_path
-        ]
+            cmd = [
+                "ffmpeg", "-y",
+                "-i", video_path,
+                "-vf", f"ass={ass_file}",
+                "-c:a", "copy",
+                "-c:v", "libx264",
+                "-preset", "medium",
+                "-crf", "23",
+                output_path
+            ]
 
         print("🚀 Running FFmpeg:")
         print("🧾", " ".join(cmd))
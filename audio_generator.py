@@ -1,51 +1,217 @@
-import edge_tts
 import asyncio
+import json
 import os
+import re
+import time
+from importlib import metadata
+
+from disk_cache import DiskCache, make_key
+from lazy_imports import load
+
+# Sentence boundary: end punctuation (optionally closing quote) + whitespace
+SENTENCE_SPLIT = re.compile(r'(?:(?<=[.!?…])|(?<=[.!?…]["\')\]]))\s+')
+
+# edge-tts always returns audio-24khz-48kbitrate-mono-mp3 (constant bitrate),
+# so a chunk's duration follows directly from its byte length.
+EDGE_TTS_BITRATE = 48000
+TICKS_PER_SECOND = 10_000_000  # WordBoundary offsets are in 100ns units
+
+# Synthesized chunks: MP3 bytes + word timings, keyed by text/voice/settings
+tts_cache = DiskCache(
+    "tts",
+    max_bytes=int(os.getenv("TTS_CACHE_MB", "256")) * 1024 * 1024
+)
+
+
+def split_into_chunks(text, chunk_size=500):
+    """
+    Group whole sentences into chunks of at most chunk_size words, so a
+    chunk boundary never falls mid-sentence. A single sentence longer
+    than chunk_size is split on word boundaries.
+    """
+    chunks = []
+    current = []
+
+    for sentence in SENTENCE_SPLIT.split(text.strip()):
+        words = sentence.split()
+        if not words:
+            continue
+
+        if current and len(current) + len(words) > chunk_size:
+            chunks.append(' '.join(current))
+            current = []
+
+        while len(words) > chunk_size:
+            chunks.append(' '.join(words[:chunk_size]))
+            words = words[chunk_size:]
+
+        current.extend(words)
+
+    if current:
+        chunks.append(' '.join(current))
+
+    return chunks
+
+
+def normalize_chunk_text(chunk):
+    return ' '.join(chunk.split())
+
+
+def edge_tts_version():
+    # Read from the package metadata so a fully cached run never imports edge-tts
+    try:
+        return metadata.version("edge-tts")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def chunk_cache_key(chunk, voice, rate, pitch):
+    return make_key(
+        "edge-tts", edge_tts_version(),
+        voice, rate, pitch, normalize_chunk_text(chunk)
+    )
+
+
+async def synthesize_chunk(chunk, voice, rate="+0%", pitch="+0Hz"):
+    """
+    Synthesize one chunk in memory.
+    Returns (mp3_bytes, word_boundaries); boundaries are the raw edge-tts
+    WordBoundary events (offset/duration in 100ns ticks, text).
+    """
+    communicate = load("edge_tts").Communicate(
+        chunk, voice, rate=rate, pitch=pitch, boundary="WordBoundary"
+    )
+    audio = bytearray()
+    boundaries = []
+    async for message in communicate.stream():
+        if message["type"] == "audio":
+            audio.extend(message["data"])
+        elif message["type"] == "WordBoundary":
+            boundaries.append({
+                "offset": message["offset"],
+                "duration": message["duration"],
+                "text": message["text"],
+            })
+    return bytes(audio), boundaries
+
+
+def load_cached_chunk(key):
+    """Returns (mp3_bytes, word_boundaries) from the TTS cache, or None."""
+    audio = tts_cache.get_bytes(key + ":audio")
+    boundaries = tts_cache.get_json(key + ":words")
+    if audio is None or boundaries is None:
+        return None
+    return audio, boundaries
+
+
+def store_cached_chunk(key, audio, boundaries):
+    tts_cache.put_bytes(key + ":audio", audio)
+    tts_cache.put_json(key + ":words", boundaries)
+
+
+def merge_word_timings(chunk_results):
+    """
+    Joins the WordBoundary events of every chunk into one list of
+    {"word", "start", "end"} (seconds), shifting each chunk by the
+    duration of the audio before it.
+    """
+    words = []
+    chunk_start = 0.0
+
+    for audio, boundaries in chunk_results:
+        for b in boundaries:
+            start = chunk_start + b["offset"] / TICKS_PER_SECOND
+            end = start + b["duration"] / TICKS_PER_SECOND
+            words.append({"word": b["text"], "start": start, "end": end})
+        chunk_start += len(audio) * 8 / EDGE_TTS_BITRATE
+
+    return words
+
+
+async def generate_audio(text, output_file="long_output.mp3",
+                                voice="en-US-JennyNeural", chunk_size=500,
+                                max_concurrency=4, requests_per_second=None,
+                                rate="+0%", pitch="+0Hz", use_cache=True,
+                                word_timings_file=None):
+    """
+    Handles long text by splitting it into sentence-aligned chunks,
+    synthesizing up to max_concurrency chunks at a time and streaming
+    them into output_file in order.
+    requests_per_second optionally spaces out request starts.
+    Chunks already synthesized with the same voice/rate/pitch are read
+    from the TTS cache unless use_cache is False.
+    If word_timings_file is given, the per-word timings reported by the
+    TTS engine are written there as JSON (used for captions).
+    """
 
-async def generate_audio(text, output_file="long_output.mp3", 
-                                voice="en-US-JennyNeural", chunk_size=500):
-    """Handles long text by splitting into chunks and merging them."""
-    
     # 1. Basic Text Cleaning
     print("====Text Cleaning ====")
     text = text.replace("``", '"').replace("''", '"')
-    
+
     # 2. Split text into manageable chunks
     print("====Splitting Text ====")
-    words = text.split()
-    chunks = [' '.join(words[i:i+chunk_size]) for i in range(0, len(words), chunk_size)]
-    
-    all_audio = []
+    chunks = split_into_chunks(text, chunk_size)
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    rate_lock = asyncio.Lock()
+    next_start = [0.0]
+
+    async def run(i, chunk):
+        key = chunk_cache_key(chunk, voice, rate, pitch) if use_cache else None
+        if key:
+            cached = load_cached_chunk(key)
+            if cached:
+                print(f"♻️ Chunk {i+1}/{len(chunks)} loaded from TTS cache")
+                return cached
+
+        async with semaphore:
+            if requests_per_second:
+                # Rate limit instead of a fixed sleep between chunks
+                async with rate_lock:
+                    delay = next_start[0] - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    next_start[0] = time.monotonic() + 1 / requests_per_second
+
+            print(f"Processing chunk {i+1}/{len(chunks)}...")
+            audio, boundaries = await synthesize_chunk(chunk, voice, rate, pitch)
+
+        if key and audio:
+            store_cached_chunk(key, audio, boundaries)
+        return audio, boundaries
+
     print("====Generating=====")
+    # 3. Generate Audio for all chunks concurrently
+    tasks = [asyncio.create_task(run(i, chunk)) for i, chunk in enumerate(chunks)]
+    completed = False
     try:
-        # 3. Generate Audio for each chunk
-        for i, chunk in enumerate(chunks):
-            print(f"Processing chunk {i+1}/{len(chunks)}...")
-            communicate = edge_tts.Communicate(chunk, voice)
-            
-            temp_file = f"temp_chunk_{i}.mp3"
-            await communicate.save(temp_file)
-            all_audio.append(temp_file)
-            
-            # Small sleep to prevent being flagged as a bot
-            await asyncio.sleep(0.5)
-        
-        # 4. Combine all chunks (Binary Merge)
-        # This part must be OUTSIDE the loop above
-        print("Merging audio files...")
+        # 4. Write chunks to the output in order as soon as each is ready
+        results = []
         with open(output_file, 'wb') as outfile:
-            for tf in all_audio: # Changed 'temp_files' to 'all_audio'
-                with open(tf, 'rb') as infile:
-                    outfile.write(infile.read())
-        
+            for task in tasks:
+                audio, boundaries = await task
+                outfile.write(audio)
+                results.append((audio, boundaries))
+
         print(f"Success! Created: {output_file}")
 
+        if word_timings_file:
+            words = merge_word_timings(results)
+            with open(word_timings_file, 'w', encoding='utf-8') as f:
+                json.dump(words, f, ensure_ascii=False)
+            print(f"Word timings: {len(words)} words → {word_timings_file}")
+        tts_cache.print_stats()
+        completed = True
+
     finally:
-        # 5. Cleanup temporary files
-        print("Cleaning up temporary files...")
-        for temp_file in all_audio:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+        # 5. Stop any chunk still running after a failure, wait for the
+        # cancellations to land and drop the half-written output
+        if not completed:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if os.path.exists(output_file):
+                os.remove(output_file)
 
     return output_file
-
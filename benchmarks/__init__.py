@@ -0,0 +1,5 @@
+# Offline micro-benchmarks for the media stages.
+#
+#   python -m benchmarks.media_bench run --out bench_baseline.json
+#   python -m benchmarks.media_bench run --out bench_current.json
+#   python -m benchmarks.media_bench compare bench_baseline.json bench_current.json
@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+
+# Deterministic, offline media fixtures for the benchmarks:
+# lavfi testsrc2 clips at several resolutions, a TTS-like mono MP3 and a
+# matching word-timings file (so captions don't need Whisper).
+
+DEFAULT_RESOLUTIONS = ["720x1280", "1080x1920", "1440x2560"]
+CLIP_SECONDS = 12
+AUDIO_SECONDS = 45
+WORD_SECONDS = 0.35
+
+
+def _ffmpeg(*args):
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", *args]
+    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def make_clip(path, size, seconds=CLIP_SECONDS, fps=30, seed=0):
+    """H.264 test pattern clip, bit-exact for a given size/seed."""
+    if os.path.exists(path):
+        return path
+    _ffmpeg(
+        "-f", "lavfi",
+        "-i", f"testsrc2=size={size}:rate={fps}:duration={seconds}",
+        "-vf", f"hue=h={seed * 40}",
+        "-pix_fmt", "yuv420p",
+        "-c:v", "libx264", "-preset", "ultrafast", "-threads", "1",
+        "-fflags", "+bitexact", "-flags:v", "+bitexact",
+        path
+    )
+    return path
+
+
+def make_audio(path, seconds=AUDIO_SECONDS):
+    """Mono 24 kHz 48 kbit/s MP3, the same format edge-tts produces."""
+    if os.path.exists(path):
+        return path
+    _ffmpeg(
+        "-f", "lavfi",
+        "-i", f"sine=frequency=220:beep_factor=4:duration={seconds}",
+        "-ar", "24000", "-ac", "1",
+        "-c:a", "libmp3lame", "-b:a", "48k",
+        "-fflags", "+bitexact",
+        path
+    )
+    return path
+
+
+def make_word_timings(path, seconds=AUDIO_SECONDS):
+    """Synthetic word timings in the format generate_audio writes."""
+    words = []
+    t = 0.0
+    i = 0
+    while t + WORD_SECONDS <= seconds:
+        words.append({"word": f"word{i}", "start": t, "end": t + WORD_SECONDS * 0.8})
+        t += WORD_SECONDS
+        i += 1
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(words, f)
+    return path
+
+
+def build_fixtures(root, resolutions=None, clips_per_resolution=2):
+    """
+    Creates (or reuses) every fixture under root.
+    Returns a dict of fixture paths; "clip_dirs" maps resolution -> folder.
+    """
+    resolutions = resolutions or DEFAULT_RESOLUTIONS
+    os.makedirs(root, exist_ok=True)
+
+    clip_dirs = {}
+    for size in resolutions:
+        clip_dir = os.path.join(root, f"clips_{size}")
+        os.makedirs(clip_dir, exist_ok=True)
+        for n in range(1, clips_per_resolution + 1):
+            make_clip(os.path.join(clip_dir, f"ved_{n}.mp4"), size, seed=n)
+        clip_dirs[size] = clip_dir
+
+    return {
+        "clip_dirs": clip_dirs,
+        "audio": make_audio(os.path.join(root, "audio_reel.mp3")),
+        "word_timings": make_word_timings(os.path.join(root, "word_timings.json")),
+    }
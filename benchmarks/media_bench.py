@@ -0,0 +1,299 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import tracing
+from benchmarks.fixtures import build_fixtures, DEFAULT_RESOLUTIONS
+
+# Times each media stage on its own against local fixtures (no network).
+# Every run of every case happens in a fresh process, so peak RSS and
+# imports don't leak between cases.
+
+DEFAULT_WORK_DIR = "bench_work"
+
+
+# ------------------ Cases ------------------
+# Each case prepares its inputs (untimed) and returns the callable to time.
+# Video cases chain: merge -> trim -> mux -> subtitle. A case whose input
+# is missing (e.g. run with --only) gets it built once per resolution, by
+# running the upstream cases in a separate process before any timed run.
+
+def _paths(work, size):
+    return {
+        "merged": os.path.join(work, f"merged_{size}.mp4"),
+        "trimmed": os.path.join(work, f"trimmed_{size}.mp4"),
+        "with_audio": os.path.join(work, f"with_audio_{size}.mp4"),
+        "ass": os.path.join(work, f"captions_{size}.ass"),
+        "final": os.path.join(work, f"final_{size}.mp4"),
+        "final_soft": os.path.join(work, f"final_soft_{size}.mp4"),
+        "single_pass": os.path.join(work, f"single_pass_{size}.mp4"),
+    }
+
+
+def case_get_audio_duration(fx, work, size):
+    from utils import get_audio_duration
+    return lambda: get_audio_duration(fx["audio"]) > 0
+
+
+def case_merge_reel_videos(fx, work, size):
+    from merge_bg_vedios import merge_reel_videos
+    p = _paths(work, size)
+    return lambda: merge_reel_videos(video_dir=fx["clip_dirs"][size], output_file=p["merged"])
+
+
+def case_trim_vedio_to_audio_length(fx, work, size):
+    from trim_vedio import trim_vedio_to_audio_length
+    p = _paths(work, size)
+    return lambda: trim_vedio_to_audio_length(p["merged"], fx["audio"], p["trimmed"])
+
+
+def case_create_video_with_audio(fx, work, size):
+    from add_audio_in_vedio import create_video_with_audio
+    p = _paths(work, size)
+    return lambda: create_video_with_audio(p["trimmed"], fx["audio"], p["with_audio"])
+
+
+def case_add_subtitle(fx, work, size):
+    from add_subtitle_to_vedio import add_subtitle
+    p = _paths(work, size)
+    return lambda: add_subtitle(
+        p["with_audio"], fx["audio"], p["final"], p["ass"],
+        word_timings_file=fx["word_timings"]
+    )
+
+
+def case_add_subtitle_soft(fx, work, size):
+    from add_subtitle_to_vedio import add_subtitle
+    p = _paths(work, size)
+    return lambda: add_subtitle(
+        p["with_audio"], fx["audio"], p["final_soft"], p["ass"],
+        word_timings_file=fx["word_timings"], subtitle_mode="soft"
+    )
+
+
+def case_render_reel_video(fx, work, size):
+    from add_subtitle_to_vedio import create_ass_subtitle
+    from render_reel import render_reel_video
+    p = _paths(work, size)
+    create_ass_subtitle(fx["audio"], p["ass"], word_timings_file=fx["word_timings"])
+    return lambda: render_reel_video(
+        video_dir=fx["clip_dirs"][size], audio_path=fx["audio"],
+        ass_file=p["ass"], output_path=p["single_pass"]
+    )
+
+
+# (name, per-resolution?)
+CASES = [
+    ("get_audio_duration", False, case_get_audio_duration),
+    ("merge_reel_videos", True, case_merge_reel_videos),
+    ("trim_vedio_to_audio_length", True, case_trim_vedio_to_audio_length),
+    ("create_video_with_audio", True, case_create_video_with_audio),
+    ("add_subtitle", True, case_add_subtitle),
+    ("add_subtitle_soft", True, case_add_subtitle_soft),
+    ("render_reel_video", True, case_render_reel_video),
+]
+CASE_FUNCS = {name: func for name, _, func in CASES}
+
+# case -> (upstream case, key in _paths() of the file it produces)
+CASE_INPUTS = {
+    "trim_vedio_to_audio_length": ("merge_reel_videos", "merged"),
+    "create_video_with_audio": ("trim_vedio_to_audio_length", "trimmed"),
+    "add_subtitle": ("create_video_with_audio", "with_audio"),
+    "add_subtitle_soft": ("create_video_with_audio", "with_audio"),
+}
+
+
+def _prepare_inputs(name, fx, work, size):
+    """Builds the input file of a chained case (untimed) if it is missing."""
+    if name not in CASE_INPUTS:
+        return
+    upstream, output = CASE_INPUTS[name]
+    if os.path.exists(_paths(work, size)[output]):
+        return
+
+    _prepare_inputs(upstream, fx, work, size)
+    if not CASE_FUNCS[upstream](fx, work, size)():
+        raise RuntimeError(f"{name}: building its input with {upstream} failed")
+
+
+@contextlib.contextmanager
+def _quiet(verbose):
+    """Silences stage output unless verbose."""
+    with contextlib.ExitStack() as stack:
+        out = sys.stdout if verbose else stack.enter_context(open(os.devnull, "w"))
+        stack.enter_context(contextlib.redirect_stdout(out))
+        yield
+
+
+def _prepare_case(name, fx, work, size, verbose):
+    """Builds a case's missing inputs (in its own process, never timed)."""
+    with _quiet(verbose):
+        _prepare_inputs(name, fx, work, size)
+
+
+def _run_case(name, fx, work, size, verbose):
+    """Runs one case once (inside a fresh worker process)."""
+    with _quiet(verbose):
+        timed = CASE_FUNCS[name](fx, work, size)
+        with tracing.span(name, "bench"):
+            ok = bool(timed())
+    metrics = tracing.events()[-1]["args"]
+    return ok, metrics
+
+
+def _ffmpeg_version():
+    try:
+        result = subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, text=True)
+        return result.stdout.splitlines()[0]
+    except (OSError, IndexError):
+        return None
+
+
+# ------------------ Commands ------------------
+def run_benchmarks(out_path, work=DEFAULT_WORK_DIR, resolutions=None,
+                   repeat=3, only=None, verbose=False):
+    resolutions = resolutions or DEFAULT_RESOLUTIONS
+    print("🧪 Building fixtures...")
+    fx = build_fixtures(os.path.join(work, "fixtures"), resolutions)
+
+    results = {}
+    for name, per_resolution, _ in CASES:
+        if only and name not in only:
+            continue
+
+        for size in (resolutions if per_resolution else [None]):
+            key = f"{name}@{size}" if size else name
+            runs = []
+            error = None
+
+            try:
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    pool.submit(_prepare_case, name, fx, work, size, verbose).result()
+            except Exception as e:
+                error = str(e)
+                repeat_runs = 0
+            else:
+                repeat_runs = repeat
+
+            for _ in range(repeat_runs):
+                try:
+                    with ProcessPoolExecutor(max_workers=1) as pool:
+                        ok, metrics = pool.submit(_run_case, name, fx, work, size, verbose).result()
+                except Exception as e:
+                    error = str(e)
+                    break
+                if not ok:
+                    error = "stage returned False"
+                    break
+                runs.append(metrics)
+
+            if error:
+                results[key] = {"error": error}
+                print(f"   ❌ {key}: {error}")
+                continue
+
+            walls = [r["wall_s"] for r in runs]
+            results[key] = {
+                "wall_s": statistics.median(walls),
+                "wall_min_s": min(walls),
+                "cpu_s": statistics.median(r["cpu_s"] + r["child_cpu_s"] for r in runs),
+                "peak_rss_mb": max(max(r["peak_rss_mb"], r["child_peak_rss_mb"]) for r in runs),
+                "runs": len(runs),
+            }
+            r = results[key]
+            print(
+                f"   ✅ {key:<40} wall {r['wall_s']:7.3f}s  "
+                f"cpu {r['cpu_s']:7.3f}s  rss {r['peak_rss_mb']:7.1f} MB"
+            )
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "ffmpeg": _ffmpeg_version(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Results written: {out_path}")
+    return report
+
+
+def compare(baseline_path, current_path, threshold=0.10, rss_threshold=0.20):
+    """
+    Flags cases whose median wall time grew by more than threshold (or
+    peak RSS by more than rss_threshold). Returns the number of regressions.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    with open(current_path, "r", encoding="utf-8") as f:
+        current = json.load(f)["results"]
+
+    regressions = 0
+    print(f"{'case':<42} {'base':>9} {'now':>9} {'change':>8}")
+    for key in sorted(set(baseline) | set(current)):
+        b = baseline.get(key)
+        c = current.get(key)
+        if not b or not c or "error" in b or "error" in c:
+            status = "error" if (c and "error" in c) else "missing"
+            print(f"{key:<42} {'-':>9} {'-':>9} {status:>8}")
+            if c is None or "error" in c:
+                regressions += 1
+            continue
+
+        change = c["wall_s"] / b["wall_s"] - 1 if b["wall_s"] else 0.0
+        rss_change = c["peak_rss_mb"] / b["peak_rss_mb"] - 1 if b["peak_rss_mb"] else 0.0
+        flags = []
+        if change > threshold:
+            flags.append("🐢 SLOWER")
+        if rss_change > rss_threshold:
+            flags.append(f"🐘 RSS +{rss_change:.0%}")
+        regressions += bool(flags)
+
+        print(
+            f"{key:<42} {b['wall_s']:8.3f}s {c['wall_s']:8.3f}s {change:+7.1%} "
+            + " ".join(flags)
+        )
+
+    if regressions:
+        print(f"\n❌ {regressions} regression(s) over {threshold:.0%} wall / {rss_threshold:.0%} RSS")
+    else:
+        print("\n✅ No regressions")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline media stage benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="run the benchmarks and write a JSON report")
+    run_p.add_argument("--out", default="bench_results.json")
+    run_p.add_argument("--work", default=DEFAULT_WORK_DIR)
+    run_p.add_argument("--resolutions", nargs="+", default=DEFAULT_RESOLUTIONS)
+    run_p.add_argument("--repeat", type=int, default=3)
+    run_p.add_argument("--only", nargs="+", choices=list(CASE_FUNCS))
+    run_p.add_argument("--verbose", action="store_true")
+
+    cmp_p = sub.add_parser("compare", help="compare a report against a baseline")
+    cmp_p.add_argument("baseline")
+    cmp_p.add_argument("current")
+    cmp_p.add_argument("--threshold", type=float, default=0.10)
+    cmp_p.add_argument("--rss-threshold", type=float, default=0.20)
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run_benchmarks(args.out, args.work, args.resolutions, args.repeat, args.only, args.verbose)
+    else:
+        sys.exit(1 if compare(args.baseline, args.current, args.threshold, args.rss_threshold) else 0)
@@ -1,18 +1,68 @@
 import requests
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+
+from clip_library import get_canonical, normalize_clip, clip_library
+from disk_cache import DiskCache, make_key
 
 PEXELS_VIDEO_API = "https://api.pexels.com/videos/search"
 
+# Output size used to pick renditions when the caller gives none ("WIDTHxHEIGHT")
+DEFAULT_TARGET_SIZE = tuple(
+    int(v) for v in os.getenv("PEXELS_TARGET_SIZE", "1080x1920").lower().split("x")
+)
+
+_stats_lock = threading.Lock()
+
+# Search JSON expires so new uploads show up; clip files never change.
+search_cache = DiskCache(
+    "pexels_search",
+    max_bytes=50 * 1024 * 1024,
+    ttl=float(os.getenv("PEXELS_SEARCH_TTL_HOURS", "24")) * 3600
+)
+media_cache = DiskCache(
+    "pexels_media",
+    max_bytes=int(os.getenv("PEXELS_MEDIA_CACHE_MB", "2048")) * 1024 * 1024
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session(pool_size=16):
+    """
+    Shared keep-alive session for Pexels search and CDN downloads.
+    One connection pool per host, reused by every worker thread.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
 def fetch_vertical_pixabay_videos(
     search_titles,
     api_key,
     per_page=15,
-    timeout=15
+    timeout=15,
+    max_workers=4,
+    target_size=None,
+    output_dir="reel_vedios",
+    normalize=False
 ):
     """
     Download one most relevant vertical HD video per keyword from Pexels.
-    Videos are saved as ved_1.mp4, ved_2.mp4, etc. in reel_vedios directory.
+    Videos are saved as ved_1.mp4, ved_2.mp4, etc. in output_dir.
+    Keywords are searched and downloaded concurrently; numbering still
+    follows keyword order.
     
     Args:
         search_titles (dict): Dictionary with structure {'title': [keyword1, keyword2, ...]}
@@ -20,13 +70,23 @@ def fetch_vertical_pixabay_videos(
         api_key (str): Your Pexels API key
         per_page (int): Number of videos to fetch per keyword for selection
         timeout (int): Request timeout in seconds
+        max_workers (int): Keywords processed at the same time (1 = sequential)
+        target_size (tuple): (width, height) of the final render, used to
+                             pick the smallest sufficient rendition
+        output_dir (str): Directory the clips are saved in
+        normalize (bool): Store every clip in the canonical form of
+                          clip_library (target_size, 30 fps), transcoding
+                          each Pexels rendition only once. Only worth it
+                          when the render stream-copies the clips
+                          (soft subtitles); raw downloads are then not
+                          kept in the media cache as well
     
     Returns:
         list: List of downloaded video file paths
     """
-    # Create reel_vedios directory if it doesn't exist
-    output_dir = Path("reel_vedios")
-    output_dir.mkdir(exist_ok=True)
+    # Create the output directory if it doesn't exist
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
     
     downloaded_videos = []
     video_counter = 1
@@ -35,108 +95,196 @@ def fetch_vertical_pixabay_videos(
     headers = {
         "Authorization": api_key.strip()  # Remove any whitespace
     }
+
+    session = get_http_session()
+    stats = {"bytes": 0, "saved_bytes": 0}
     
     # Extract the list of keywords (each keyword is actually a title)
     # search_titles = {'title': ['keyword1', 'keyword2', 'keyword3']}
-    for main_key, keyword_list in search_titles.items():
-        for keyword in keyword_list:
-            
-            
-            best_video = None
-            best_score = -1
-            
-            try:
-                print(f"\n   Searching Pexels for: '{keyword}'...")
-                
-                # Pexels API parameters for vertical videos
-                params = {
-                    'query': keyword,
-                    'orientation': 'portrait',  # Vertical videos
-                    'per_page': min(per_page, 80),  # Pexels max is 80
-                    'size': 'medium',
-                }
-                
-                # Make the API request
-                response = requests.get(
-                    PEXELS_VIDEO_API,
-                    headers=headers,
-                    params=params,
-                    timeout=timeout
-                )
-                
-                response.raise_for_status()
-                data = response.json()
-                
-                # Process videos and find the best one
-                if 'videos' in data and data['videos']:
-                    
-                    for video in data['videos']:
-                        # Calculate relevance score
-                        score = calculate_video_score(video, keyword)
-                        
-                        if score > best_score:
-                            best_score = score
-                            best_video = video
-                            best_video['search_keyword'] = keyword
-                
-                else:
-                    print(f"   ⚠️ No videos found for: {keyword}")
-                    
-            except requests.exceptions.Timeout:
-                print(f"   ⏱️ Timeout error for: {keyword}")
-                continue
-                
-            except requests.exceptions.HTTPError as e:
-                if response.status_code == 429:
-                    print(f"   ⚠️ Rate limit exceeded. Wait before making more requests.")
-                elif response.status_code == 401:
-                    print(f"   🔐 Invalid API key. Check your Pexels API key.")
-                else:
-                    print(f"   ❌ HTTP error: {e}")
-                continue
-                
-            except requests.exceptions.RequestException as e:
-                print(f"   ❌ Request error: {str(e)}")
-                continue
-                
-            except ValueError as e:
-                print(f"   ⚠️ JSON parsing error: {str(e)}")
-                continue
-            
-            # Download the best video for this keyword
-            if best_video:
-                video_filename = f"ved_{video_counter}.mp4"
-                video_path = output_dir / video_filename
-                
-                success = download_best_quality_video(
-                    best_video, 
-                    video_path, 
-                    headers
-                )
-                
-                if success:
-                    downloaded_videos.append(str(video_path))
-                    print(f"\n   ✅ Downloaded: {video_filename}")
-                    print(f"      Duration: {best_video['duration']}s")
-                    print(f"      Dimensions: {best_video['width']}x{best_video['height']}")
-                    print(f"      Keyword: '{best_video['search_keyword']}'")
-                    print(f"      Relevance score: {best_score:.2f}")
-                    print(f"      By: {best_video['user']['name']}")
-                    video_counter += 1
-                else:
-                    print(f"   ❌ Failed to download video for: '{keyword}'")
-            else:
-                print(f"\n   ⚠️ No suitable video found for: '{keyword}'")
+    keywords = [
+        keyword
+        for main_key, keyword_list in search_titles.items()
+        for keyword in keyword_list
+    ]
+
+    def fetch(job):
+        index, keyword = job
+        return fetch_keyword_video(
+            session, index, keyword, headers, output_dir, per_page, timeout,
+            target_size, stats, normalize
+        )
+
+    jobs = list(enumerate(keywords, 1))
+    if max_workers > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+            results = list(pool.map(fetch, jobs))
+    else:
+        results = [fetch(job) for job in jobs]
+
+    # Number the successful downloads in keyword order
+    for result in results:
+        if not result:
+            continue
+
+        part_path, best_video, best_score = result
+        video_filename = f"ved_{video_counter}.mp4"
+        video_path = output_dir / video_filename
+        os.replace(part_path, video_path)
+
+        downloaded_videos.append(str(video_path))
+        print(f"\n   ✅ Downloaded: {video_filename}")
+        print(f"      Duration: {best_video['duration']}s")
+        print(f"      Dimensions: {best_video['width']}x{best_video['height']}")
+        print(f"      Keyword: '{best_video['search_keyword']}'")
+        print(f"      Relevance score: {best_score:.2f}")
+        print(f"      By: {best_video['user']['name']}")
+        video_counter += 1
     
     print(f"\n{'='*70}")
     print(f"🎬 DOWNLOAD COMPLETE!")
     print(f"   Total videos downloaded: {len(downloaded_videos)}")
     print(f"   Location: {output_dir.absolute()}")
+    print(f"   Downloaded size: {stats['bytes'] / (1024 * 1024):.1f} MB "
+          f"(saved ~{stats['saved_bytes'] / (1024 * 1024):.1f} MB vs largest renditions)")
+    search_cache.print_stats()
+    if normalize:
+        clip_library.print_stats()
+    else:
+        media_cache.print_stats()
     print(f"{'='*70}\n")
     
     return downloaded_videos
 
 
+def fetch_keyword_video(session, index, keyword, headers, output_dir,
+                        per_page=15, timeout=15, target_size=None, stats=None,
+                        normalize=False):
+    """
+    Search Pexels for one keyword and download the best match to a
+    temporary ".part" file (ignored by the merge step). With normalize,
+    the canonical version from the clip library is used when present
+    (no download at all), otherwise the download is normalized and stored.
+
+    Returns:
+        tuple: (part_path, best_video, best_score) or None on failure
+    """
+    best_video, best_score = search_best_video(
+        session, keyword, headers, per_page, timeout
+    )
+
+    if not best_video:
+        print(f"\n   ⚠️ No suitable video found for: '{keyword}'")
+        return None
+
+    part_path = output_dir / f"ved_{index}.part"
+
+    if normalize:
+        target_width, target_height = target_size or DEFAULT_TARGET_SIZE
+        chosen, _ = select_rendition(best_video.get('video_files'), target_width, target_height)
+        rendition = ("pexels", best_video.get('id'),
+                     chosen.get('id') if chosen else None,
+                     chosen.get('width') if chosen else None,
+                     chosen.get('height') if chosen else None)
+
+        if get_canonical(rendition, part_path, target_width, target_height):
+            print(f"      ♻️ Using canonical clip from library for: '{keyword}'")
+            return part_path, best_video, best_score
+
+    success = download_best_quality_video(
+        best_video, 
+        part_path, 
+        headers,
+        session,
+        target_size,
+        stats,
+        use_cache=not normalize
+    )
+
+    if not success:
+        print(f"   ❌ Failed to download video for: '{keyword}'")
+        return None
+
+    if normalize:
+        print(f"      🎛️ Normalizing clip for: '{keyword}'")
+        normalize_clip(part_path, rendition, target_width, target_height)
+
+    return part_path, best_video, best_score
+
+
+def search_best_video(session, keyword, headers, per_page=15, timeout=15):
+    """
+    Search Pexels for a keyword and pick the most relevant video.
+
+    Returns:
+        tuple: (best_video, best_score), best_video is None if nothing fits
+    """
+    best_video = None
+    best_score = -1
+    
+    try:
+        print(f"\n   Searching Pexels for: '{keyword}'...")
+        
+        # Pexels API parameters for vertical videos
+        params = {
+            'query': keyword,
+            'orientation': 'portrait',  # Vertical videos
+            'per_page': min(per_page, 80),  # Pexels max is 80
+            'size': 'medium',
+        }
+        
+        cache_key = make_key(PEXELS_VIDEO_API, params)
+        data = search_cache.get_json(cache_key)
+
+        if data is None:
+            # Make the API request
+            response = session.get(
+                PEXELS_VIDEO_API,
+                headers=headers,
+                params=params,
+                timeout=timeout
+            )
+            
+            response.raise_for_status()
+            data = response.json()
+            search_cache.put_json(cache_key, data)
+        else:
+            print(f"   ♻️ Using cached search results for: '{keyword}'")
+        
+        # Process videos and find the best one
+        if 'videos' in data and data['videos']:
+            
+            for video in data['videos']:
+                # Calculate relevance score
+                score = calculate_video_score(video, keyword)
+                
+                if score > best_score:
+                    best_score = score
+                    best_video = video
+                    best_video['search_keyword'] = keyword
+        
+        else:
+            print(f"   ⚠️ No videos found for: {keyword}")
+            
+    except requests.exceptions.Timeout:
+        print(f"   ⏱️ Timeout error for: {keyword}")
+        
+    except requests.exceptions.HTTPError as e:
+        if response.status_code == 429:
+            print(f"   ⚠️ Rate limit exceeded. Wait before making more requests.")
+        elif response.status_code == 401:
+            print(f"   🔐 Invalid API key. Check your Pexels API key.")
+        else:
+            print(f"   ❌ HTTP error: {e}")
+        
+    except requests.exceptions.RequestException as e:
+        print(f"   ❌ Request error: {str(e)}")
+        
+    except ValueError as e:
+        print(f"   ⚠️ JSON parsing error: {str(e)}")
+
+    return best_video, best_score
+
+
 def calculate_video_score(video, keyword):
     """
     Calculate relevance score for a video based on multiple factors.
@@ -216,16 +364,64 @@ def calculate_video_score(video, keyword):
     return score
 
 
-def download_best_quality_video(video, output_path, headers):
+def select_rendition(video_files, target_width, target_height):
     """
-    Download the highest quality HD video file.
-    
-    Priority: UHD/4K > HD > SD
+    Pick the smallest rendition that still covers the target output size,
+    so we never download (and decode) 4K just to scale it down.
+    Falls back to the largest rendition when none is big enough.
+
+    Returns:
+        tuple: (chosen_file, largest_file), both None if nothing usable
+    """
+    candidates = [
+        f for f in (video_files or [])
+        if f and isinstance(f, dict) and 'link' in f
+        and (f.get('width') or 0) > 0 and (f.get('height') or 0) > 0
+    ]
+    if not candidates:
+        return None, None
+
+    def area(f):
+        return f['width'] * f['height']
+
+    # Compare short and long sides so orientation metadata doesn't matter
+    target_short, target_long = sorted((target_width, target_height))
+    largest = max(candidates, key=area)
+
+    sufficient = [
+        f for f in candidates
+        if min(f['width'], f['height']) >= target_short
+        and max(f['width'], f['height']) >= target_long
+    ]
+    if not sufficient:
+        return largest, largest
+
+    return min(sufficient, key=area), largest
+
+
+def estimate_saved_bytes(chosen, largest, downloaded_bytes):
+    """Bytes avoided by not taking the largest rendition."""
+    if chosen is largest:
+        return 0
+    if chosen.get('size') and largest.get('size'):
+        return max(largest['size'] - chosen['size'], 0)
+    ratio = (largest['width'] * largest['height']) / (chosen['width'] * chosen['height'])
+    return int(downloaded_bytes * (ratio - 1))
+
+
+def download_best_quality_video(video, output_path, headers, session=None,
+                                target_size=None, stats=None, use_cache=True):
+    """
+    Download the smallest video file that covers the target output size.
     
     Args:
         video (dict): Video object from Pexels API
         output_path (Path): Where to save the video
         headers (dict): Authorization headers
+        session (requests.Session): Pooled session, shared one if None
+        target_size (tuple): (width, height) to cover, DEFAULT_TARGET_SIZE if None
+        stats (dict): Optional {"bytes", "saved_bytes"} counters to update
+        use_cache (bool): Read/store the file in the media cache
     
     Returns:
         bool: True if download successful, False otherwise
@@ -234,41 +430,10 @@ def download_best_quality_video(video, output_path, headers):
         print(f"      ❌ No video files available")
         return False
     
-    # Define quality priority
-    quality_priority = {
-        'uhd': 3,
-        '4k': 3,
-        'hd': 2,
-        'sd': 1,
-        'mobile': 0
-    }
-    
-    # Find best quality file
-    best_file = None
-    best_quality_score = -1
-    
-    for file in video['video_files']:
-        # FIXED: Handle None and check if file is a dict
-        if not file or not isinstance(file, dict):
-            continue
-            
-        quality = file.get('quality')
-        if not quality:  # Skip if no quality field
-            continue
-            
-        quality_lower = quality.lower()
-        quality_score = quality_priority.get(quality_lower, 0)
-        
-        # Also consider resolution - larger usually means better quality
-        file_width = file.get('width', 0)
-        file_height = file.get('height', 0)
-        file_size = file_width * file_height
-        
-        total_score = quality_score * 1000000 + file_size
-        
-        if total_score > best_quality_score and 'link' in file:
-            best_quality_score = total_score
-            best_file = file
+    target_width, target_height = target_size or DEFAULT_TARGET_SIZE
+    best_file, largest_file = select_rendition(
+        video['video_files'], target_width, target_height
+    )
     
     if not best_file:
         print(f"      ❌ No suitable quality found")
@@ -276,14 +441,24 @@ def download_best_quality_video(video, output_path, headers):
     
     try:
         download_url = best_file['link']
-        quality = best_file.get('quality', 'unknown')
+        quality = best_file.get('quality') or 'unknown'
         width = best_file.get('width', 'unknown')
         height = best_file.get('height', 'unknown')
         
+        cache_key = make_key(
+            "pexels_video", video.get('id'),
+            best_file.get('id'), quality, width, height
+        )
+        if use_cache and media_cache.get_file(cache_key, output_path):
+            print(f"      ♻️ Using cached {quality.upper()} file ({width}x{height})")
+            record_download(stats, best_file, largest_file, output_path)
+            return True
+
         print(f"      📥 Downloading {quality.upper()} quality ({width}x{height})...")
         
         # Download the video file
-        response = requests.get(download_url, stream=True, timeout=60)
+        session = session or get_http_session()
+        response = session.get(download_url, stream=True, timeout=60)
         response.raise_for_status()
         
         # Get file size for progress tracking
@@ -292,12 +467,14 @@ def download_best_quality_video(video, output_path, headers):
         
         # Write to file in chunks
         with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
+            for chunk in response.iter_content(chunk_size=256 * 1024):
                 if chunk:
                     f.write(chunk)
                     downloaded_size += len(chunk)
                     
-                   
+        if use_cache:
+            media_cache.put_file(cache_key, output_path)
+        record_download(stats, best_file, largest_file, output_path)
         return True
         
     except Exception as e:
@@ -308,4 +485,11 @@ def download_best_quality_video(video, output_path, headers):
         return False
 
 
-
+def record_download(stats, chosen, largest, output_path):
+    if stats is None:
+        return
+    size = os.path.getsize(output_path)
+    saved = estimate_saved_bytes(chosen, largest, size)
+    with _stats_lock:
+        stats["bytes"] += size
+        stats["saved_bytes"] += saved
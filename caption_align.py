@@ -0,0 +1,165 @@
+import difflib
+import os
+import re
+
+# Script-aware captions: we already know every word that was spoken (the
+# TTS script), so Whisper only has to say *when*. The smallest model is
+# run with the script as its prompt, its words are matched back to the
+# script with difflib, and script words it missed or misheard get
+# timings interpolated from their matched neighbours. Caption text always
+# comes from the script, so recognition errors never reach the video.
+
+ALIGN_MODEL = os.getenv("WHISPER_ALIGN_MODEL", "tiny")
+MIN_WORD_SECONDS = 0.15  # interpolated words stay on screen at least this long
+
+_TOKEN_CLEAN = re.compile(r"[^\w']+")
+
+
+def normalize_token(word) -> str:
+    return _TOKEN_CLEAN.sub("", word.lower())
+
+
+def _spread(script_words, start, end):
+    """Timings for words spoken between start and end, by character length."""
+    weights = [max(len(w), 1) for w in script_words]
+    total = sum(weights)
+    timings = []
+    t = start
+    for word, weight in zip(script_words, weights):
+        step = (end - start) * weight / total
+        timings.append({"word": word, "start": t, "end": t + step})
+        t += step
+    return timings
+
+
+def align_script_words(script, asr_words, audio_end=None, stats=None):
+    """
+    Maps the script's words onto ASR word timings.
+    asr_words: list of {"word", "start", "end"} from Whisper.
+    audio_end: length of the audio, where trailing skipped words may end.
+    stats: optional dict, gets "matched" (script words Whisper heard as-is)
+    and "interpolated" counts.
+    Returns one {"word", "start", "end"} per script word, in script order.
+    """
+    script_words = script.split()
+    if not script_words:
+        return []
+    if not asr_words:
+        if not audio_end:
+            return []
+        if stats is not None:
+            stats.update(matched=0, interpolated=len(script_words))
+        return _spread(script_words, 0.0, audio_end)
+
+    a = [normalize_token(w) for w in script_words]
+    b = [normalize_token(w["word"]) for w in asr_words]
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+
+    timings = [None] * len(script_words)
+    matched = 0
+    interpolated = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            matched += i2 - i1
+        if tag == "equal" or (tag == "replace" and i2 - i1 == j2 - j1):
+            # Same words (or the same number of misheard ones): 1:1
+            for k in range(i2 - i1):
+                w = asr_words[j1 + k]
+                timings[i1 + k] = {"word": script_words[i1 + k], "start": w["start"], "end": w["end"]}
+        elif tag == "replace":
+            # Different word counts: share the heard span between the script words
+            span = _spread(script_words[i1:i2], asr_words[j1]["start"], asr_words[j2 - 1]["end"])
+            timings[i1:i2] = span
+
+    # Script words Whisper skipped: fill the gap between matched neighbours
+    end_of_audio = audio_end or asr_words[-1]["end"]
+    i = 0
+    while i < len(timings):
+        if timings[i] is not None:
+            i += 1
+            continue
+        j = i
+        while j < len(timings) and timings[j] is None:
+            j += 1
+        if i == 0:
+            # Before the first heard word: share [0, its start) evenly,
+            # never overlapping it or starting before the audio. With too
+            # little room, the first heard word gives up some of its span.
+            if j < len(timings):
+                first = timings[j]
+                first_start = max(first["start"], 0.0)
+                short = MIN_WORD_SECONDS * j - first_start
+                if short > 0:
+                    first_start += min(short, max(first["end"] - first_start - MIN_WORD_SECONDS, 0.0))
+                    first["start"] = first_start
+            else:
+                first_start = end_of_audio
+            step = first_start / j
+            timings[:j] = [
+                {"word": w, "start": k * step, "end": (k + 1) * step}
+                for k, w in enumerate(script_words[:j])
+            ]
+            interpolated += j
+            i = j
+            continue
+
+        gap_start = timings[i - 1]["end"]
+        gap_end = timings[j]["start"] if j < len(timings) else max(end_of_audio, gap_start)
+        need = MIN_WORD_SECONDS * (j - i)
+        if gap_end - gap_start < need:
+            # No room between the neighbours: overlap them rather than
+            # emit captions too short to ever be seen
+            gap_end = gap_start + need
+            if gap_end > end_of_audio:
+                gap_end = max(end_of_audio, need)
+                gap_start = gap_end - need
+        timings[i:j] = _spread(script_words[i:j], gap_start, gap_end)
+        interpolated += j - i
+        i = j
+
+    if stats is not None:
+        stats["matched"] = matched
+        stats["interpolated"] = interpolated
+    return timings
+
+
+def align_captions(audio_path, script, language="en", whisper_model=None, audio_end=None):
+    """
+    Word timings for the script, placed with a small Whisper model prompted
+    with the script. Uses the resident whisper_server when one is running.
+    audio_end is the audio length (probed when not given), so script
+    words Whisper skipped at the end still get on-screen time.
+    Returns a list of {"word", "start", "end"} whose words are the script's.
+    """
+    from whisper_server import transcribe_via_server, transcribe_local
+    from media_probe import get_duration
+
+    if audio_end is None:
+        try:
+            audio_end = get_duration(audio_path)
+        except Exception as e:
+            print(f"⚠️ Could not read the audio length: {e}")
+
+    model = whisper_model or ALIGN_MODEL
+    options = {"initial_prompt": script}
+
+    print(f"🧭 Aligning script to audio with Whisper '{model}'...")
+    asr_words = transcribe_via_server(audio_path, model, language, **options)
+    if asr_words is None:
+        asr_words = transcribe_local(audio_path, model, language, **options)
+
+    if not asr_words:
+        if not audio_end:
+            print(f"❌ Alignment failed: Whisper '{model}' heard no words")
+            return []
+        print(f"⚠️ Alignment failed: Whisper '{model}' heard no words "
+              f"→ spreading the script over {audio_end:.2f}s of audio")
+
+    stats = {}
+    words = align_script_words(script, asr_words, audio_end, stats)
+    print(
+        f"✅ Aligned {len(words)} script words "
+        f"({stats.get('matched', 0)} heard as written, "
+        f"{stats.get('interpolated', 0)} interpolated)"
+    )
+    return words
@@ -0,0 +1,104 @@
+import json
+import math
+import os
+import threading
+
+from disk_cache import CACHE_DIR
+from media_probe import probe_many
+
+# Predicts the narration length from the script so the B-roll plan (one
+# clip per SECONDS_PER_CLIP of audio) can be made before TTS finishes.
+# The words-per-minute figure per voice is calibrated from past runs.
+
+SECONDS_PER_CLIP = 10
+DEFAULT_WPM = 165  # edge-tts neural voices at +0% rate
+CALIBRATION_FILE = os.path.join(CACHE_DIR, "speaking_rate.json")
+CALIBRATION_WEIGHT = 0.3  # weight of the newest run in the moving average
+
+_lock = threading.Lock()
+
+
+def _load_calibration():
+    try:
+        with open(CALIBRATION_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def speaking_rate(voice) -> float:
+    """Calibrated words per minute for the voice."""
+    with _lock:
+        entry = _load_calibration().get(voice)
+    return entry["wpm"] if entry else DEFAULT_WPM
+
+
+def estimate_duration(script, voice) -> float:
+    """Predicted narration length in seconds."""
+    return len(script.split()) / speaking_rate(voice) * 60
+
+
+def record_speaking_rate(script, voice, duration):
+    """Feeds a real (script, duration) pair back into the calibration."""
+    words = len(script.split())
+    if not words or duration <= 0:
+        return
+
+    observed = words / duration * 60
+    with _lock:
+        data = _load_calibration()
+        entry = data.get(voice)
+        if entry:
+            wpm = (1 - CALIBRATION_WEIGHT) * entry["wpm"] + CALIBRATION_WEIGHT * observed
+            data[voice] = {"wpm": wpm, "samples": entry["samples"] + 1}
+        else:
+            data[voice] = {"wpm": observed, "samples": 1}
+
+        os.makedirs(os.path.dirname(CALIBRATION_FILE) or ".", exist_ok=True)
+        tmp = f"{CALIBRATION_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, CALIBRATION_FILE)
+
+    print(f"🗣️ Speaking rate for {voice}: observed {observed:.0f} wpm, "
+          f"calibrated {data[voice]['wpm']:.0f} wpm")
+
+
+def clip_count(duration) -> int:
+    """Number of B-roll clips for a given narration length."""
+    return max(1, math.ceil(duration / SECONDS_PER_CLIP))
+
+
+def reconcile_clips(clips, actual_duration):
+    """
+    Cheap fix-up once the real audio length is known: if the downloaded
+    footage is shorter than the audio, reuse clips (in order) until it
+    covers it, instead of going back to the LLM and Pexels. Footage that
+    already covers the audio is left for the render to trim.
+    """
+    if not clips:
+        return list(clips)
+
+    try:
+        durations = [info["duration"] or 0.0 for info in probe_many(clips)]
+    except Exception as e:
+        print(f"⚠️ Could not probe clips ({e}) → assuming {SECONDS_PER_CLIP}s each")
+        durations = [SECONDS_PER_CLIP] * len(clips)
+
+    total = sum(durations)
+    if total >= actual_duration or not total:
+        return list(clips)
+
+    # Broken or unprobeable clips (0 s) would only add dead concat entries
+    usable = [(clip, d) for clip, d in zip(clips, durations) if d > 0]
+    reel = list(clips)
+    i = 0
+    while total < actual_duration:
+        clip, duration = usable[i % len(usable)]
+        reel.append(clip)
+        total += duration
+        i += 1
+
+    print(f"🔁 Clips cover {sum(durations):.1f}s of {actual_duration:.1f}s audio "
+          f"→ reusing {len(reel) - len(clips)} clip(s)")
+    return reel
@@ -0,0 +1,115 @@
+import os
+import subprocess
+
+from disk_cache import DiskCache, make_key
+from media_probe import probe
+
+# Library of B-roll clips transcoded once into a canonical form:
+# fixed size, 30 fps, yuv420p, closed fixed-length GOPs and identical x264
+# settings. Clips that share that form can be joined with the concat
+# demuxer and "-c copy" (no decode, no encode). Each canonical clip carries
+# a comment tag in its container, so later stages can recognise it with a
+# probe; the library is keyed by Pexels video id + rendition.
+
+CANONICAL_VERSION = 1  # bump when the encode settings below change
+CANONICAL_FPS = 30
+GOP_SECONDS = 2
+CANONICAL_CRF = 20
+TRACK_TIMESCALE = 15360
+
+clip_library = DiskCache(
+    "clip_library",
+    max_bytes=int(os.getenv("CLIP_LIBRARY_MB", "2048")) * 1024 * 1024
+)
+
+
+def canonical_tag(width, height, fps=CANONICAL_FPS) -> str:
+    return f"yt-shorts canonical v{CANONICAL_VERSION} {width}x{height}@{fps}"
+
+
+def canonical_key(key_parts, width, height, fps=CANONICAL_FPS) -> str:
+    return make_key("canonical_clip", CANONICAL_VERSION, *key_parts, width, height, fps)
+
+
+def is_canonical_info(info, width, height, fps=CANONICAL_FPS) -> bool:
+    """True if a media_probe result carries the canonical tag for this form."""
+    tags = {k.lower(): v for k, v in (info.get("tags") or {}).items()}
+    return tags.get("comment") == canonical_tag(width, height, fps)
+
+
+def is_canonical(path, width, height, fps=CANONICAL_FPS) -> bool:
+    try:
+        return is_canonical_info(probe(path), width, height, fps)
+    except Exception:
+        return False
+
+
+def build_normalize_command(src, dest, width=1080, height=1920, fps=CANONICAL_FPS):
+    """ffmpeg command that transcodes src into the canonical form at dest."""
+    gop = fps * GOP_SECONDS
+    return [
+        "ffmpeg",
+        "-y",
+        "-i", str(src),
+        "-vf",
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,"
+        f"fps={fps},"
+        f"setsar=1",
+        "-an",
+        "-pix_fmt", "yuv420p",
+        "-c:v", "libx264",
+        "-preset", "veryfast",
+        "-crf", str(CANONICAL_CRF),
+        "-profile:v", "high",
+        "-level:v", "4.2",
+        "-g", str(gop),
+        "-keyint_min", str(gop),
+        "-sc_threshold", "0",
+        "-bf", "2",
+        "-video_track_timescale", str(TRACK_TIMESCALE),
+        "-map_metadata", "-1",
+        "-metadata", f"comment={canonical_tag(width, height, fps)}",
+        "-movflags", "+faststart",
+        "-f", "mp4",
+        str(dest)
+    ]
+
+
+def get_canonical(key_parts, dest, width=1080, height=1920, fps=CANONICAL_FPS) -> bool:
+    """Copies the canonical version of a clip to dest. Returns True on a hit."""
+    return clip_library.get_file(canonical_key(key_parts, width, height, fps), dest)
+
+
+def normalize_clip(path, key_parts, width=1080, height=1920, fps=CANONICAL_FPS) -> bool:
+    """
+    Replaces the clip at path with its canonical version (transcoded once,
+    then served from the library). Returns False and leaves the original
+    clip in place if the transcode fails.
+    """
+    path = str(path)
+    tmp = f"{path}.canonical"
+
+    try:
+        subprocess.run(
+            build_normalize_command(path, tmp, width, height, fps),
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        os.replace(tmp, path)
+        clip_library.put_file(canonical_key(key_parts, width, height, fps), path)
+        return True
+
+    except subprocess.CalledProcessError as e:
+        print("      🔥 Canonical transcode failed")
+        print(e.stderr.decode(errors="ignore")[-2000:])
+        return False
+
+    except Exception as e:
+        print(f"      🔥 Canonical transcode failed: {e}")
+        return False
+
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
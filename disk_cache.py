@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+# Small persistent cache on local disk.
+# Entries are stored under the sha256 of their key. The file mtime is the
+# time the entry was written (used for TTL) and the atime is bumped on every
+# hit (used for LRU eviction when the cache grows past max_bytes).
+
+CACHE_DIR = os.getenv("YT_CACHE_DIR", ".cache")
+
+
+def make_key(*parts) -> str:
+    """Stable key from any JSON-serialisable values."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    def __init__(self, name, max_bytes=512 * 1024 * 1024, ttl=None, root=None):
+        self.name = name
+        self.root = os.path.join(root or CACHE_DIR, name)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    # ------------------ Internals ------------------
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _lookup(self, key):
+        """Return the entry path on a valid hit, None otherwise."""
+        path = self._path(key)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._count("misses")
+            return None
+
+        now = time.time()
+        if self.ttl is not None and now - st.st_mtime > self.ttl:
+            self._count("expired")
+            self._count("misses")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        try:
+            os.utime(path, (now, st.st_mtime))  # mark as recently used
+        except OSError:
+            pass
+        self._count("hits")
+        return path
+
+    def _write(self, key, writer):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            writer(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._count("writes")
+        self.evict()
+
+    # ------------------ Public API ------------------
+    def get_bytes(self, key):
+        path = self._lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put_bytes(self, key, data):
+        def writer(tmp):
+            with open(tmp, "wb") as f:
+                f.write(data)
+        self._write(key, writer)
+
+    def get_json(self, key):
+        data = self.get_bytes(key)
+        if data is None:
+            return None
+        try:
+            return json.loads(data.decode("utf-8"))
+        except ValueError:
+            return None
+
+    def put_json(self, key, value):
+        self.put_bytes(key, json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+    def get_file(self, key, dest) -> bool:
+        """Copy a cached file to dest. Returns True on a hit."""
+        path = self._lookup(key)
+        if path is None:
+            return False
+        try:
+            shutil.copyfile(path, dest)
+            return True
+        except OSError:
+            return False
+
+    def put_file(self, key, src):
+        self._write(key, lambda tmp: shutil.copyfile(src, tmp))
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes."""
+        if self.max_bytes is None or not os.path.isdir(self.root):
+            return
+
+        with self._lock:
+            entries = []
+            total = 0
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    if filename.endswith(".tmp"):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_atime, st.st_size, path))
+                    total += st.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    self.stats["evictions"] += 1
+                except OSError:
+                    pass
+
+    def print_stats(self):
+        s = self.stats
+        lookups = s["hits"] + s["misses"]
+        rate = (s["hits"] / lookups * 100) if lookups else 0.0
+        print(
+            f"🗄️ Cache '{self.name}': {s['hits']} hits / {s['misses']} misses "
+            f"({rate:.0f}% hit rate), {s['expired']} expired, "
+            f"{s['writes']} writes, {s['evictions']} evicted"
+        )
@@ -0,0 +1,57 @@
+import importlib
+import sys
+import threading
+import time
+
+# Heavy modules (whisper/torch, googleapiclient, LLM SDKs, edge-tts) are
+# imported on first use through load(), which records how long each first
+# import took. print_report() shows those times next to the time it took
+# the entry point to become ready, so slow imports are easy to spot.
+
+PROCESS_START = time.perf_counter()
+
+_import_times = {}
+_ready_at = None
+_lock = threading.Lock()
+
+
+def load(module_name):
+    """importlib.import_module that records the cost of the first import."""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+
+    # The import lock makes concurrent first imports wait on each other;
+    # only the thread that actually imported records a time.
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _import_times.setdefault(module_name, elapsed)
+    return module
+
+
+def mark_ready():
+    """Called by an entry point once argument parsing/setup is done."""
+    global _ready_at
+    if _ready_at is None:
+        _ready_at = time.perf_counter() - PROCESS_START
+
+
+def import_times() -> dict:
+    with _lock:
+        return dict(_import_times)
+
+
+def print_report():
+    times = import_times()
+
+    print("\n⏱️ Startup report")
+    if _ready_at is not None:
+        print(f"   ready after {_ready_at:.3f}s")
+    if not times:
+        print("   no deferred imports loaded")
+        return
+    for name, seconds in sorted(times.items(), key=lambda kv: -kv[1]):
+        print(f"   {name:<28} {seconds:7.3f}s")
+    print(f"   {'total deferred imports':<28} {sum(times.values()):7.3f}s")
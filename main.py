@@ -1,90 +1,296 @@
 from dotenv import load_dotenv
+import argparse
 import asyncio
 import json
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-from audio_generator import generate_audio
-from script_generator import generate_youtube_short_metadata, get_genre
-from utils import generate_pexels_title_from_audio_and_text, cleanup_paths
-from bg_vedio_generator import fetch_vertical_pixabay_videos
-from merge_bg_vedios import merge_reel_videos
-from trim_vedio import trim_vedio_to_audio_length
-from add_audio_in_vedio import create_video_with_audio
-from add_subtitle_to_vedio import add_subtitle
-from youtube_automation import upload_video_to_yt
+from utils import generate_pexels_title_from_script, get_audio_duration, cleanup_paths
+from chunk_planner import reconcile_clips, record_speaking_rate
+from clip_library import CANONICAL_VERSION
+from lazy_imports import load, mark_ready, print_report as print_startup_report
+from stage_scheduler import Stage, run_stages
+from workspace import create_workspace, latest_run_id, list_run_ids, prune_workspaces
+from run_manifest import RunManifest
+import tracing
+
+REEL_SIZE = (1080, 1920)
+VOICE = "en-US-JennyNeural"
+
+
+# ------------------ Stages ------------------
+# Stage modules are loaded on first use, so a process only pays for the
+# SDKs (and Whisper/torch) of the stages it actually runs.
+def stage_metadata(genre):
+    return load("script_generator").generate_youtube_short_metadata(genre)
+
+
+def stage_audio(metadata, workspace):
+    generate_audio = load("audio_generator").generate_audio
+    audio = asyncio.run(generate_audio(
+        metadata["script"], workspace["audio"], voice=VOICE,
+        word_timings_file=workspace["word_timings"]
+    ))
+    if audio != workspace["audio"]:
+        return None
+    return audio, workspace["word_timings"]
+
+
+def stage_titles(metadata):
+    return generate_pexels_title_from_script(metadata["script"], VOICE)
+
+
+def stage_clips(titles, workspace, subtitle_mode):
+    api_key = os.getenv("PEXELS_API_KEY")
+    fetch_vertical_pixabay_videos = load("bg_vedio_generator").fetch_vertical_pixabay_videos
+    # Canonical clips only pay off when the render can stream-copy them
+    # (soft subtitles); a burn-in render encodes everything once anyway.
+    return fetch_vertical_pixabay_videos(titles, api_key, 30, 15,
+                                         target_size=REEL_SIZE,
+                                         output_dir=workspace["clips_dir"],
+                                         normalize=subtitle_mode == "soft")
+
+
+def stage_reconcile(clips, audio, metadata):
+    duration = get_audio_duration(audio)
+    record_speaking_rate(metadata["script"], VOICE, duration)
+    return reconcile_clips(clips, duration)
+
+
+def stage_captions(audio, word_timings, metadata, workspace, subtitle_mode, caption_source):
+    create_ass_subtitle = load("add_subtitle_to_vedio").create_ass_subtitle
+    source = {"word_timings_file": word_timings, "caption_source": caption_source,
+              "script": metadata["script"]}
+    if subtitle_mode == "soft":
+        # SRT only: muxed as a mov_text track, nothing to burn in
+        if not create_ass_subtitle(audio, None, srt_file=workspace["srt"], **source):
+            return None
+        return workspace["srt"]
+
+    if not create_ass_subtitle(audio, workspace["ass"], **source):
+        return None
+    return workspace["ass"]
+
+
+def stage_render(reel_clips, audio, captions, workspace, subtitle_mode):
+    render_reel_video = load("render_reel").render_reel_video
+    width, height = REEL_SIZE
+    soft = subtitle_mode == "soft"
+    if not render_reel_video(audio_path=audio,
+                             ass_file=None if soft else captions,
+                             srt_file=captions if soft else None,
+                             subtitle_mode=subtitle_mode,
+                             output_path=workspace["final"], videos=reel_clips,
+                             width=width, height=height):
+        return None
+    return workspace["final"]
 
-if __name__ == "__main__":
-    load_dotenv()
 
-    temp_files = [
-        "audio_reel.mp3",
-        "merged_bg_vedios.mp4",
-        "vedio_with_audio.mp4",
-        "tiktok_style.ass",
-        "trimed_bg_vedios.mp4",
-        "vedio_with_audio.mp4",
-        "reel_vedios",
-        "final_vedio.mp4"
+def stage_upload(reel, metadata):
+    description = metadata["description"].rstrip(". ")
+    description += (
+        ".\n\nDerived from generative inference and should not be treated as empirical fact."
+    )
+
+    return load("youtube_automation").upload_video_to_yt(
+        reel,
+        metadata["title"],
+        description,
+        metadata["tags"],
+        privacy_status="public",
+    )
+
+
+def build_stages(upload=True):
+    """
+    Pipeline graph. The B-roll plan is made from the predicted narration
+    length, so Pexels titles and clip downloads run alongside TTS; a cheap
+    reconcile step fixes the clip list once the real audio length is
+    known. Captions only need the audio, its TTS word timings and the
+    script (for alignment). upload=False leaves out the YouTube upload.
+    """
+    stages = [
+        Stage("metadata", stage_metadata,
+              inputs=["genre"], outputs=["metadata"],
+              error="Failed to generate metadata"),
+        Stage("audio", stage_audio,
+              inputs=["metadata", "workspace"], outputs=["audio", "word_timings"],
+              error="Audio generation failed",
+              params={"voice": VOICE}),
+        Stage("titles", stage_titles,
+              inputs=["metadata"], outputs=["titles"],
+              error="Failed to generate Pexels titles",
+              params={"voice": VOICE}),
+        Stage("clips", stage_clips,
+              inputs=["titles", "workspace", "subtitle_mode"], outputs=["clips"],
+              error="Failed to fetch Pixabay videos",
+              params={"size": REEL_SIZE, "canonical": CANONICAL_VERSION}),
+        Stage("reconcile", stage_reconcile,
+              inputs=["clips", "audio", "metadata"], outputs=["reel_clips"],
+              error="Failed to reconcile clips with the audio"),
+        Stage("captions", stage_captions,
+              inputs=["audio", "word_timings", "metadata", "workspace",
+                      "subtitle_mode", "caption_source"],
+              outputs=["captions"],
+              error="Subtitle generation failed"),
+        Stage("render", stage_render,
+              inputs=["reel_clips", "audio", "captions", "workspace", "subtitle_mode"],
+              outputs=["reel"],
+              error="Reel render failed",
+              params={"size": REEL_SIZE}),
     ]
+    if upload:
+        stages.append(Stage("upload", stage_upload,
+                            inputs=["reel", "metadata"], outputs=["upload"],
+                            error="YouTube upload failed"))
+    return stages
+
+
+def run_pipeline(run_id=None, resume=False, subtitle_mode=None, caption_source=None):
+    """
+    Produces and uploads one reel inside its own workspace directory.
+    subtitle_mode is "burn" (captions drawn into the video) or "soft"
+    (a mov_text subtitle track, no caption encode); SUBTITLE_MODE env
+    when not given. YouTube ignores embedded subtitle tracks, so a soft
+    run is a local preview: it is not uploaded and its workspace is kept.
+    caption_source is "tts", "align" or "whisper"
+    (CAPTION_SOURCE env, default "tts").
+    Every finished stage is checkpointed in the workspace manifest; with
+    resume=True, stages whose inputs and outputs are unchanged are skipped.
+    A Chrome trace and a JSON summary of the run are written to traces/.
+    The workspace is removed on success and kept on failure (stale failed
+    workspaces are pruned, see workspace.prune_workspaces). Raises on failure.
+    """
+    workspace = create_workspace(run_id)
+    print(f"📂 Workspace: {workspace['root']}")
+    prune_workspaces(exclude={workspace["run_id"]})
+    if resume:
+        print(f"🔁 Resuming run {workspace['run_id']}")
 
+    manifest = RunManifest(workspace["root"], resume=resume)
+    genre = manifest.initial("genre", load("script_generator").get_genre)
+
+    subtitle_mode = subtitle_mode or os.getenv("SUBTITLE_MODE", "burn")
+    preview = subtitle_mode == "soft"
+
+    tracing.reset()
     try:
-        genre = get_genre()
-        metadata = generate_youtube_short_metadata(genre)
+        artifacts = run_stages(
+            build_stages(upload=not preview),
+            {"genre": genre, "workspace": workspace,
+             "subtitle_mode": subtitle_mode,
+             "caption_source": caption_source or os.getenv("CAPTION_SOURCE", "tts")},
+            manifest=manifest
+        )
+    finally:
+        tracing.print_summary()
+        tracing.export(workspace["run_id"])
+        print_startup_report()
 
-        if not metadata:
-            raise RuntimeError("Failed to generate metadata")
+    print("==== Completed Successfully ====")
+    if preview:
+        print(f"🔍 Soft-subtitle preview (not uploaded): {artifacts['reel']}")
+    else:
+        cleanup_paths(workspace["root"])
+    return artifacts
 
-        script = metadata["script"]
 
-        audio = asyncio.run(generate_audio(script, "audio_reel.mp3"))
-        if audio != "audio_reel.mp3":
-            raise RuntimeError("Audio generation failed")
+def run_reel(index):
+    """Runs one reel and reports (ok, seconds, error) instead of raising."""
+    start = time.perf_counter()
+    try:
+        run_pipeline()
+        return True, time.perf_counter() - start, None
+    except Exception as e:
+        print(f"\n❌ REEL {index} FAILED: {e}", file=sys.stderr)
+        return False, time.perf_counter() - start, str(e)
 
-        data = generate_pexels_title_from_audio_and_text(audio, script)
-        if not data:
-            raise RuntimeError("Failed to generate Pexels titles")
 
-        api_key = os.getenv("PEXELS_API_KEY")
-        vedios = fetch_vertical_pixabay_videos(data, api_key, 30, 15)
-        if not vedios:
-            raise RuntimeError("Failed to fetch Pixabay videos")
+def run_batch(count, parallel=1):
+    """
+    Produces count reels. With parallel == 1 they run one after another in
+    this process, reusing the warmed imports, LLM clients, Whisper model
+    and YouTube service. With parallel > 1, a pool of worker processes
+    runs that many pipelines at once, each in its own workspace (and each
+    worker still reuses its warm resources across the reels it runs).
+    A failed reel is reported and the batch moves on.
+    Returns the number of failed reels.
+    """
+    batch_start = time.perf_counter()
+    indexes = range(1, count + 1)
 
-        is_vedio_merged = merge_reel_videos()
-        if not is_vedio_merged:
-            raise RuntimeError("Video merge failed")
+    if parallel > 1:
+        print(f"🚀 Running {count} reels on {parallel} worker processes")
+        with ProcessPoolExecutor(max_workers=parallel) as pool:
+            results = list(pool.map(run_reel, indexes))
+    else:
+        results = []
+        for i in indexes:
+            print(f"\n{'#'*60}\n🎞️ Reel {i}/{count}\n{'#'*60}")
+            results.append(run_reel(i))
 
-        is_vedio_trimmed = trim_vedio_to_audio_length()
-        if not is_vedio_trimmed:
-            raise RuntimeError("Video trim failed")
+    total = time.perf_counter() - batch_start
+    succeeded = sum(1 for ok, _, _ in results if ok)
 
-        is_audio_attached = create_video_with_audio()
-        if not is_audio_attached:
-            raise RuntimeError("Audio attachment failed")
+    print(f"\n{'='*60}")
+    print("📊 Batch summary")
+    for i, (ok, seconds, error) in enumerate(results, 1):
+        status = "✅" if ok else f"❌ {error}"
+        print(f"   Reel {i}: {seconds:.1f}s {status}")
+    print(f"   Succeeded: {succeeded}/{count}")
+    print(f"   Wall time: {total:.1f}s ({total / count:.1f}s per reel)")
+    print(f"   Throughput: {succeeded / total * 3600:.1f} reels/hour")
+    print(f"{'='*60}")
 
-        is_subtitle_attached = add_subtitle()
-        if not is_subtitle_attached:
-            raise RuntimeError("Subtitle attachment failed")
+    return count - succeeded
 
-        description = metadata["description"].rstrip(". ")
-        description += (
-            ".\n\nDerived from generative inference and should not be treated as empirical fact."
-        )
 
-        is_yt_uploaded = upload_video_to_yt(
-            "final_vedio.mp4",
-            metadata["title"],
-            description,
-            metadata["tags"],
-            privacy_status="public",
-        )
+if __name__ == "__main__":
+    load_dotenv()
 
-        if not is_yt_uploaded:
-            raise RuntimeError("YouTube upload failed")
+    parser = argparse.ArgumentParser(description="Generate and upload YouTube Shorts")
+    parser.add_argument("--count", type=int, default=1,
+                        help="number of reels to produce in this process")
+    parser.add_argument("--parallel", type=int, default=1,
+                        help="number of pipelines to run at the same time")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="RUN_ID",
+                        help="resume a failed run (default: the latest workspace)")
+    parser.add_argument("--subtitle-mode", choices=["burn", "soft"],
+                        help="burn captions into the video (default) or add them "
+                             "as a soft subtitle track (local preview, not uploaded)")
+    parser.add_argument("--caption-source", choices=["tts", "align", "whisper"],
+                        help="caption timings from TTS word boundaries (default), the "
+                             "script aligned by a tiny Whisper model, or full Whisper")
+    args = parser.parse_args()
+    if args.resume and args.count > 1:
+        parser.error("--resume continues a single run and can't be combined with --count > 1")
+    # Environment, so batch worker processes pick them up too
+    if args.subtitle_mode:
+        os.environ["SUBTITLE_MODE"] = args.subtitle_mode
+    if args.caption_source:
+        os.environ["CAPTION_SOURCE"] = args.caption_source
+    mark_ready()
 
-        print("==== Completed Successfully ====")
+    if args.count > 1:
+        failures = run_batch(args.count, args.parallel)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if failures:
+            sys.exit(1)  # ❌ GitHub Actions → RED
+        sys.exit(0)
 
-        cleanup_paths(*temp_files)
+    try:
+        if args.resume:
+            run_id = latest_run_id() if args.resume == "latest" else args.resume
+            if not run_id:
+                raise RuntimeError("No previous run to resume")
+            if run_id not in list_run_ids():
+                raise RuntimeError(f"No run workspace named {run_id}")
+            run_pipeline(run_id, resume=True)
+        else:
+            run_pipeline()
         sys.stdout.flush()
         sys.stderr.flush()
 
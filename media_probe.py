@@ -0,0 +1,135 @@
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+
+# One ffprobe call per media file: container duration, every stream with
+# its codec, resolution, fps and tags. Results are memoized by path, size
+# and mtime, so the stages that need a duration (planning, reconcile,
+# render, trim) share a single probe per file.
+
+PROBE_CACHE_SIZE = 512
+
+_probe_cache = OrderedDict()
+_probe_lock = threading.Lock()
+
+
+def _parse_rate(rate):
+    """ffprobe frame rates look like "30000/1001"; "0/0" means unknown."""
+    try:
+        value = Fraction(rate)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return float(value) if value else None
+
+
+def _parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_stream(s):
+    stream = {
+        "index": s.get("index"),
+        "type": s.get("codec_type"),
+        "codec": s.get("codec_name"),
+        "duration": _parse_float(s.get("duration")),
+        "bit_rate": _parse_float(s.get("bit_rate")),
+        "tags": s.get("tags") or {},
+    }
+    if stream["type"] == "video":
+        stream.update({
+            "width": s.get("width"),
+            "height": s.get("height"),
+            "fps": _parse_rate(s.get("avg_frame_rate")) or _parse_rate(s.get("r_frame_rate")),
+            "pix_fmt": s.get("pix_fmt"),
+        })
+    elif stream["type"] == "audio":
+        stream.update({
+            "sample_rate": _parse_float(s.get("sample_rate")),
+            "channels": s.get("channels"),
+        })
+    return stream
+
+
+def _run_ffprobe(path):
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_format", "-show_streams",
+        "-of", "json",
+        path
+    ]
+    result = subprocess.run(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    data = json.loads(result.stdout)
+    fmt = data.get("format") or {}
+    streams = [_parse_stream(s) for s in data.get("streams", [])]
+
+    duration = _parse_float(fmt.get("duration"))
+    if duration is None:
+        durations = [s["duration"] for s in streams if s["duration"]]
+        duration = max(durations) if durations else None
+
+    video = next((s for s in streams if s["type"] == "video"), None)
+    audio = next((s for s in streams if s["type"] == "audio"), None)
+    return {
+        "path": path,
+        "format": fmt.get("format_name"),
+        "duration": duration,
+        "size": _parse_float(fmt.get("size")),
+        "bit_rate": _parse_float(fmt.get("bit_rate")),
+        "tags": fmt.get("tags") or {},
+        "streams": streams,
+        "video": video,
+        "audio": audio,
+    }
+
+
+def probe(path) -> dict:
+    """
+    Probe a media file (memoized by path, size and mtime).
+    Returns a dict with duration, format, tags, streams and the first
+    "video"/"audio" stream (or None). Raises RuntimeError if ffprobe fails.
+    """
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _probe_lock:
+        if key in _probe_cache:
+            _probe_cache.move_to_end(key)
+            return _probe_cache[key]
+
+    info = _run_ffprobe(path)
+
+    with _probe_lock:
+        _probe_cache[key] = info
+        while len(_probe_cache) > PROBE_CACHE_SIZE:
+            _probe_cache.popitem(last=False)
+    return info
+
+
+def probe_many(paths, max_workers=8) -> list:
+    """Probes several files concurrently (each file once); results in input order."""
+    unique = list(dict.fromkeys(paths))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique)))) as pool:
+        results = dict(zip(unique, pool.map(probe, unique)))
+    return [results[p] for p in paths]
+
+
+def get_duration(path) -> float:
+    """Return duration in seconds."""
+    duration = probe(path)["duration"]
+    if duration is None:
+        raise RuntimeError(f"No duration found for {path}")
+    return duration
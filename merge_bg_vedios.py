@@ -1,17 +1,78 @@
 import os
 import subprocess
 
+from clip_library import is_canonical
+from media_probe import probe_many
+from trim_vedio import plan_clip_budgets
+
 # merge vedios from multiple vedios of piceles.
 
+
+def write_concat_list(videos, list_path, budgets=None):
+    """
+    Writes an ffconcat file listing the videos (absolute paths).
+    budgets[i] becomes the outpoint of clip i.
+    """
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for i, v in enumerate(videos):
+            escaped = os.path.abspath(v).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+            if budgets:
+                f.write(f"outpoint {budgets[i]:.3f}\n")
+    return list_path
+
+
+def concat_copy(videos, output_file, budgets=None):
+    """
+    Joins canonical clips with the concat demuxer and stream copy.
+    With budgets, each clip stops at its outpoint (clips start on a
+    keyframe, so cutting only the end keeps stream copy exact enough).
+    Raises subprocess.CalledProcessError if ffmpeg fails.
+    """
+    list_path = f"{output_file}.ffconcat"
+    write_concat_list(videos, list_path, budgets)
+
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", list_path,
+        "-map", "0:v",
+        "-c", "copy",
+        "-movflags", "+faststart",
+        output_file
+    ]
+
+    print("🚀 Running FFmpeg (concat demuxer, stream copy)...")
+    print("🧾 Command:")
+    print(" ".join(cmd))
+
+    try:
+        subprocess.run(
+            cmd,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    finally:
+        os.remove(list_path)
+
+
 def merge_reel_videos(
     video_dir="reel_vedios",
     output_file="merged_bg_vedios.mp4",
     width=1080,
     height=1920,
-    fps=30
+    fps=30,
+    target_duration=None
 ) -> bool:
     """
     Merges all mp4 videos in a folder into a single vertical video.
+    With target_duration (the audio length), every clip gets a time budget
+    and only that many seconds of it are decoded, so the merged video
+    already has the audio's length.
     Returns True if video is generated successfully, False otherwise.
     """
 
@@ -36,9 +97,32 @@ def merge_reel_videos(
         for i, v in enumerate(videos, 1):
             print(f"   {i}. {v}")
 
+        budgets = None
+        if target_duration:
+            durations = [info["duration"] or 0.0 for info in probe_many(videos)]
+            budgets = plan_clip_budgets(durations, target_duration)
+            if budgets:
+                print("⏱️ Clip budgets: " + ", ".join(f"{b:.2f}s" for b in budgets))
+            else:
+                print(f"⚠️ Clips total {sum(durations):.2f}s < {target_duration:.2f}s, merging in full")
+
+        if all(is_canonical(v, width, height, fps) for v in videos):
+            # Same codec settings, size, fps and GOP: no re-encode needed
+            print("⚡ All clips are canonical → joining without re-encoding")
+            concat_copy(videos, output_file, budgets)
+
+            if os.path.exists(output_file):
+                print(f"✅ Video successfully created: {output_file}")
+                return True
+            print("❌ FFmpeg finished but output file not found")
+            return False
+
         # Build ffmpeg input args
         inputs = []
-        for v in videos:
+        for i, v in enumerate(videos):
+            if budgets:
+                # Input-side limit: frames past the budget are never decoded
+                inputs.extend(["-t", f"{budgets[i]:.3f}"])
             inputs.extend(["-i", v])
 
         print("⚙️ Building FFmpeg filter graph...")
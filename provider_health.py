@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+
+from disk_cache import CACHE_DIR
+
+# Persisted health stats for LLM providers and models.
+# Keys look like "gemini/gemini-2.5-flash" or "provider/generate_gemini".
+# Each key keeps success/failure counts, recent latencies and the last
+# error. A key whose circuit is open (a quota/404/auth HTTP status on that
+# model, or repeated failures) is skipped until its cooldown expires; the
+# rest are ordered by expected latency.
+
+HEALTH_FILE = os.getenv("LLM_HEALTH_FILE", os.path.join(CACHE_DIR, "provider_health.json"))
+
+LATENCY_HISTORY = 50
+FAILURES_TO_OPEN = 3
+FAILURE_COOLDOWN = 15 * 60
+
+# HTTP status of the failed call -> cooldown seconds
+HARD_ERRORS = {
+    429: 60 * 60,          # quota / rate limit
+    404: 24 * 60 * 60,     # model retired or no endpoints
+    401: 6 * 60 * 60,      # bad API key
+    403: 6 * 60 * 60,      # no permission for the model
+}
+
+_data = None
+_lock = threading.Lock()
+
+
+def _load():
+    global _data
+    if _data is None:
+        try:
+            with open(HEALTH_FILE, "r", encoding="utf-8") as f:
+                _data = json.load(f)
+        except (OSError, ValueError):
+            _data = {}
+    return _data
+
+
+def _save():
+    os.makedirs(os.path.dirname(HEALTH_FILE) or ".", exist_ok=True)
+    tmp = f"{HEALTH_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(_data, f, indent=2)
+    os.replace(tmp, HEALTH_FILE)
+
+
+def _entry(key):
+    return _load().setdefault(key, {
+        "successes": 0,
+        "failures": 0,
+        "consecutive_failures": 0,
+        "latencies": [],
+        "last_error": None,
+        "last_error_at": None,
+        "open_until": 0,
+    })
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def record_success(key, latency):
+    with _lock:
+        e = _entry(key)
+        e["successes"] += 1
+        e["consecutive_failures"] = 0
+        e["open_until"] = 0
+        e["latencies"] = (e["latencies"] + [round(latency, 3)])[-LATENCY_HISTORY:]
+        _save()
+
+
+def error_status(error):
+    """
+    HTTP status carried by an SDK error, or None. Covers
+    openai/groq APIStatusError.status_code, google.genai APIError.code and
+    errors that only keep the HTTP response.
+    """
+    for attr in ("status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def record_failure(key, error, latency=None, hard=True):
+    """
+    Counts a failure for key. With hard=True (a single model call), a
+    quota/404/auth HTTP status opens the circuit right away; otherwise
+    (e.g. a provider whose models all failed) only FAILURES_TO_OPEN
+    consecutive failures do.
+    """
+    text = str(error)
+
+    with _lock:
+        e = _entry(key)
+        e["failures"] += 1
+        e["consecutive_failures"] += 1
+        e["last_error"] = text[:300]
+        e["last_error_at"] = time.time()
+
+        cooldown = HARD_ERRORS.get(error_status(error), 0) if hard else 0
+        if not cooldown and e["consecutive_failures"] >= FAILURES_TO_OPEN:
+            cooldown = FAILURE_COOLDOWN
+
+        if cooldown:
+            e["open_until"] = time.time() + cooldown
+            print(f"🔌 Circuit open for {key} ({cooldown // 60} min): {text[:80]}")
+        _save()
+
+
+def is_open(key) -> bool:
+    with _lock:
+        return _load().get(key, {}).get("open_until", 0) > time.time()
+
+
+def stats(key) -> dict:
+    """success_rate, p50 and p95 latency (None when unknown) for a key."""
+    with _lock:
+        e = dict(_load().get(key) or {})
+    total = e.get("successes", 0) + e.get("failures", 0)
+    return {
+        "success_rate": e["successes"] / total if total else None,
+        "p50": _percentile(e.get("latencies"), 0.50),
+        "p95": _percentile(e.get("latencies"), 0.95),
+        "last_error": e.get("last_error"),
+    }
+
+
+def expected_latency(key) -> float:
+    """
+    p50 latency divided by success rate, i.e. the expected time spent on
+    this candidate per useful answer. Untried keys score 0 so they get a
+    chance to build up stats.
+    """
+    s = stats(key)
+    if s["success_rate"] is None:
+        return 0.0
+    if s["p50"] is None:
+        return float("inf")
+    return s["p50"] / max(s["success_rate"], 0.05)
+
+
+def order(candidates, key=lambda c: c):
+    """
+    Returns the candidates with open circuits removed, fastest expected
+    first (stable for ties). If every circuit is open, the original order
+    is returned so the caller still has something to try.
+    """
+    closed = [c for c in candidates if not is_open(key(c))]
+    if not closed:
+        return list(candidates)
+
+    skipped = len(candidates) - len(closed)
+    if skipped:
+        print(f"⏭️ Skipping {skipped} candidate(s) with open circuits")
+    return sorted(closed, key=lambda c: expected_latency(key(c)))
@@ -0,0 +1,273 @@
+import os
+import subprocess
+
+from clip_library import is_canonical_info
+from media_probe import probe_many, get_duration
+from merge_bg_vedios import write_concat_list
+from trim_vedio import decide_speed_and_trim, plan_clip_budgets
+
+# Single-pass render: merge + trim + audio mux + caption burn-in in one encode.
+
+
+def escape_filter_path(path: str) -> str:
+    """Escape a file path so it can be used inside an FFmpeg filter graph."""
+    return (
+        path.replace("\\", "/")
+        .replace(":", "\\:")
+        .replace("'", "\\'")
+    )
+
+
+def list_reel_videos(video_dir="reel_vedios"):
+    """Return the sorted list of .mp4 clips inside video_dir."""
+    return sorted(
+        os.path.join(video_dir, f)
+        for f in os.listdir(video_dir)
+        if f.lower().endswith(".mp4")
+    )
+
+
+def build_render_command(
+    videos,
+    audio_path,
+    ass_file,
+    output_path,
+    speed,
+    trim_end,
+    width=1080,
+    height=1920,
+    fps=30,
+    preset="medium",
+    crf=23,
+    canonical=None,
+    budgets=None,
+    srt_file=None,
+    duration=None
+):
+    """
+    Build the ffmpeg command that renders the final reel in one encode.
+    Clips are inputs 0..N-1 and the audio is input N.
+    canonical[i] marks clips already in the clip library's canonical form
+    (right size, fps and SAR), which go into concat without scale/pad/fps.
+    budgets[i] limits clip i to its first budgets[i] seconds (input-side
+    -t, so the rest of the clip is never decoded).
+    srt_file, if given, is input N+1 and muxed as a mov_text track;
+    pass the audio length as duration then (see output_length_args).
+    """
+    canonical = canonical or [False] * len(videos)
+    inputs = []
+    for i, v in enumerate(videos):
+        if budgets:
+            inputs.extend(["-t", f"{budgets[i]:.3f}"])
+        inputs.extend(["-i", v])
+    inputs.extend(["-i", audio_path])
+    if srt_file:
+        inputs.extend(["-i", srt_file])
+
+    filter_parts = []
+    for i in range(len(videos)):
+        if canonical[i]:
+            continue
+        filter_parts.append(
+            f"[{i}:v]"
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,"
+            f"fps={fps},"
+            f"setsar=1"
+            f"[v{i}]"
+        )
+
+    v_labels = "".join(
+        f"[{i}:v]" if canonical[i] else f"[v{i}]" for i in range(len(videos))
+    )
+    filter_parts.append(f"{v_labels}concat=n={len(videos)}:v=1:a=0[cat]")
+
+    post_filters = [] if speed == 1.0 else [f"setpts={1/speed}*PTS"]
+    if trim_end:
+        post_filters.append(f"trim=0:{trim_end}")
+        post_filters.append("setpts=PTS-STARTPTS")
+    if ass_file:
+        post_filters.append(f"ass={escape_filter_path(ass_file)}")
+    filter_parts.append("[cat]" + (",".join(post_filters) or "null") + "[outv]")
+
+    return [
+        "ffmpeg",
+        "-y",
+        *inputs,
+        "-filter_complex", "; ".join(filter_parts),
+        "-map", "[outv]",
+        "-map", f"{len(videos)}:a:0",
+        "-pix_fmt", "yuv420p",
+        "-c:v", "libx264",
+        "-preset", preset,
+        "-crf", str(crf),
+        "-c:a", "copy",              # TTS MP3 is muxed as-is, no re-encode
+        *soft_subtitle_args(len(videos) + 1, srt_file),
+        *output_length_args(duration),
+        "-movflags", "+faststart",
+        output_path
+    ]
+
+
+def output_length_args(duration=None):
+    """
+    -shortest also stops at the end of a subtitle track (the last caption),
+    so with soft subtitles the output is bounded by the audio length instead.
+    """
+    if duration:
+        return ["-t", f"{duration:.3f}"]
+    return ["-shortest"]
+
+
+def soft_subtitle_args(input_index, srt_file):
+    """Output args that mux input input_index as a mov_text subtitle track."""
+    if not srt_file:
+        return []
+    return ["-map", f"{input_index}:0", "-c:s", "mov_text"]
+
+
+def build_copy_render_command(concat_list, audio_path, output_path, srt_file=None,
+                              duration=None):
+    """
+    Soft-subtitle render without any encode: canonical clips joined by the
+    concat demuxer (budgets as outpoints), the TTS audio and an optional
+    mov_text caption track, all stream-copied.
+    """
+    inputs = ["-f", "concat", "-safe", "0", "-i", concat_list, "-i", audio_path]
+    if srt_file:
+        inputs.extend(["-i", srt_file])
+
+    return [
+        "ffmpeg",
+        "-y",
+        *inputs,
+        "-map", "0:v",
+        "-map", "1:a:0",
+        "-c:v", "copy",
+        "-c:a", "copy",
+        *soft_subtitle_args(2, srt_file),
+        *output_length_args(duration),
+        "-movflags", "+faststart",
+        output_path
+    ]
+
+
+def render_reel_video(
+    video_dir="reel_vedios",
+    audio_path="audio_reel.mp3",
+    ass_file="tiktok_style.ass",
+    output_path="final_vedio.mp4",
+    videos=None,
+    width=1080,
+    height=1920,
+    fps=30,
+    preset="medium",
+    crf=23,
+    subtitle_mode="burn",
+    srt_file=None
+) -> bool:
+    """
+    Renders the final reel with a single FFmpeg filter graph:
+    per-clip scale/pad/fps, concat, speed-up/trim to the audio length,
+    ASS caption burn-in and audio mapping, encoded once.
+    Replaces merge_reel_videos → trim_vedio_to_audio_length →
+    create_video_with_audio → add_subtitle.
+    With subtitle_mode="soft", srt_file is muxed as a mov_text track instead
+    of burning ass_file; if every clip is canonical and the clips cover
+    the audio, nothing is encoded at all.
+    Returns True if successful, False otherwise.
+    """
+
+    print("🎬 Rendering reel in a single pass...")
+
+    try:
+        if videos is None:
+            if not os.path.exists(video_dir):
+                print(f"❌ Folder not found: {video_dir}")
+                return False
+            videos = list_reel_videos(video_dir)
+
+        if not videos:
+            print("❌ No .mp4 videos found to render")
+            return False
+
+        if not os.path.exists(audio_path):
+            print(f"❌ Audio not found: {audio_path}")
+            return False
+
+        if subtitle_mode == "soft":
+            ass_file = None
+        subtitle_file = srt_file if subtitle_mode == "soft" else ass_file
+        if subtitle_file and not os.path.exists(subtitle_file):
+            print(f"❌ Subtitle file not found: {subtitle_file}")
+            return False
+
+        print(f"🎞️ Found {len(videos)} videos")
+        for i, v in enumerate(videos, 1):
+            print(f"   {i}. {v}")
+
+        print("⏱️ Reading durations using ffprobe...")
+        infos = probe_many(videos)
+        video_dur = sum(info["duration"] or 0.0 for info in infos)
+        canonical = [is_canonical_info(info, width, height, fps) for info in infos]
+        if all(canonical):
+            print("⚡ All clips are canonical → skipping per-clip scale/pad")
+        audio_dur = get_duration(audio_path)
+
+        print(f"🎞️ Video duration: {video_dur:.2f}s")
+        print(f"🎵 Audio duration: {audio_dur:.2f}s")
+
+        budgets = plan_clip_budgets([info["duration"] or 0.0 for info in infos], audio_dur)
+        if budgets:
+            # The budgeted clips add up to the audio: no speed-up, no trim
+            print("⏱️ Clip budgets: " + ", ".join(f"{b:.2f}s" for b in budgets))
+            speed, trim_end = 1.0, None
+        else:
+            speed, trim_end = decide_speed_and_trim(video_dur, audio_dur)
+
+        concat_list = None
+        if subtitle_mode == "soft" and budgets and all(canonical):
+            print("⚡ Soft subtitles + canonical clips → stream copy, no encode")
+            concat_list = write_concat_list(videos, f"{output_path}.ffconcat", budgets)
+            cmd = build_copy_render_command(concat_list, audio_path, output_path,
+                                            srt_file, audio_dur if srt_file else None)
+        else:
+            cmd = build_render_command(
+                videos, audio_path, ass_file, output_path,
+                speed, trim_end, width, height, fps, preset, crf, canonical, budgets,
+                srt_file if subtitle_mode == "soft" else None,
+                audio_dur if subtitle_mode == "soft" and srt_file else None
+            )
+
+        print("🚀 Running FFmpeg:")
+        print("🧾", " ".join(cmd))
+
+        try:
+            subprocess.run(
+                cmd,
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        finally:
+            if concat_list and os.path.exists(concat_list):
+                os.remove(concat_list)
+
+        if not os.path.exists(output_path):
+            print("❌ FFmpeg finished but output file not found")
+            return False
+
+        size_mb = os.path.getsize(output_path) / (1024 * 1024)
+        print(f"✅ Reel rendered: {output_path}")
+        print(f"📦 File size: {size_mb:.2f} MB")
+        return True
+
+    except subprocess.CalledProcessError as e:
+        print("🔥 FFmpeg failed")
+        print(e.stderr.decode(errors="ignore"))
+        return False
+
+    except Exception as e:
+        print("🔥 Unexpected error occurred")
+        print(str(e))
+        return False
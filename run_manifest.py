@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Checkpoint manifest for one run.
+# After every successful stage we record its parameters, a fingerprint of
+# each input and each output (content hashes for files), and the output
+# values themselves. On --resume, a stage whose parameters and inputs are
+# unchanged and whose outputs are still intact is skipped and its recorded
+# outputs are restored.
+
+MANIFEST_NAME = "manifest.json"
+
+_hash_cache = {}
+_hash_lock = threading.Lock()
+
+
+def file_sha256(path) -> str:
+    """Content hash of a file, memoized by path, size and mtime."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _hash_lock:
+        if key in _hash_cache:
+            return _hash_cache[key]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    digest = h.hexdigest()
+
+    with _hash_lock:
+        _hash_cache[key] = digest
+    return digest
+
+
+def fingerprint(value):
+    """
+    Stable fingerprint of an artifact. Strings naming existing files or
+    directories are hashed by content; lists are fingerprinted item by
+    item; anything else is hashed from its JSON form.
+    """
+    if isinstance(value, str) and os.path.isfile(value):
+        return "file:" + file_sha256(value)
+
+    if isinstance(value, str) and os.path.isdir(value):
+        h = hashlib.sha256()
+        for name in sorted(os.listdir(value)):
+            path = os.path.join(value, name)
+            if os.path.isfile(path):
+                h.update(name.encode("utf-8"))
+                h.update(file_sha256(path).encode("ascii"))
+        return "dir:" + h.hexdigest()
+
+    if isinstance(value, (list, tuple)):
+        return [fingerprint(v) for v in value]
+
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return "value:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _json_safe(value) -> bool:
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+class RunManifest:
+    def __init__(self, workspace_dir, resume=False):
+        self.path = os.path.join(workspace_dir, MANIFEST_NAME)
+        self.resume = resume
+        self._lock = threading.Lock()
+        self.data = {"initial": {}, "stages": {}}
+
+        if resume and os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def save(self):
+        with self._lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+    def initial(self, name, default_factory):
+        """
+        Returns a run-level starting value (e.g. the genre), reusing the
+        recorded one when resuming so the run stays reproducible.
+        """
+        if name not in self.data["initial"]:
+            self.data["initial"][name] = default_factory()
+            self.save()
+        return self.data["initial"][name]
+
+    def restore(self, stage, kwargs):
+        """
+        Returns the recorded outputs of the stage if it can be skipped,
+        None if it has to run again.
+        """
+        if not self.resume:
+            return None
+
+        entry = self.data["stages"].get(stage.name)
+        if not entry:
+            return None
+
+        try:
+            if entry["params"] != fingerprint(stage.params):
+                return None
+
+            for name, value in kwargs.items():
+                if entry["inputs"].get(name) != fingerprint(value):
+                    return None
+
+            outputs = {}
+            for name, recorded in entry["outputs"].items():
+                if fingerprint(recorded["value"]) != recorded["fingerprint"]:
+                    return None
+                outputs[name] = recorded["value"]
+            return outputs
+
+        except (OSError, KeyError):
+            return None
+
+    def record(self, stage, kwargs, outputs):
+        """Records a finished stage. outputs maps artifact name -> value."""
+        if not all(_json_safe(v) for v in outputs.values()):
+            return
+
+        entry = {
+            "params": fingerprint(stage.params),
+            "inputs": {name: fingerprint(v) for name, v in kwargs.items()},
+            "outputs": {
+                name: {"value": v, "fingerprint": fingerprint(v)}
+                for name, v in outputs.items()
+            },
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with self._lock:
+            self.data["stages"][stage.name] = entry
+        self.save()
@@ -1,20 +1,16 @@
-from groq import Groq
-from google import genai 
-from google.genai import types
 from dotenv import load_dotenv
 import json
 import random
 import os
-from openai import OpenAI
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from lazy_imports import load
+from tracing import span
+import provider_health
 
 load_dotenv()
 
-# ------------------ Clients ------------------
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-gemini_client = genai.Client(api_key=os.getenv("GENAI_API_KEY"))
-client = genai.Client(api_key=os.getenv("GENAI_API_KEY")) 
-
-
 # ------------------ Constants ------------------
 TOPIC_GENRES = [
     'Romance',
@@ -109,6 +105,21 @@ OPENROUTER_MODELS = [
     "nvidia/nemotron-3-nano-30b-a3b:free"
 ]
 
+# Hedged fallback: start the next provider if the current one hasn't
+# answered after LLM_HEDGE_AFTER seconds ("off" = strictly sequential).
+_hedge = os.getenv("LLM_HEDGE_AFTER", "10")
+LLM_HEDGE_AFTER = None if _hedge.lower() in ("", "off", "none") else float(_hedge)
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "45"))  # per model call
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "180"))  # whole fallback chain
+
+GEMINI_MODELS = [
+    "gemini-3-flash-preview",
+    "gemini-2.5-flash",
+    "gemini-2.5-flash-lite",
+    "gemini-2.5-flash-preview-09-2025",
+    "gemini-2.5-flash-lite-preview-09-2025"
+]
+
 # ------------------ Helpers ------------------
 def clean_json(text: str) -> str:
     """Remove markdown fences and whitespace"""
@@ -133,55 +144,126 @@ def extract_json_safe(text: str) -> dict:
             raise ValueError("No valid JSON found in model output")
         return json.loads(match.group())
 
+class AttemptCancelled(RuntimeError):
+    """Raised inside a provider that lost the race; not a health failure."""
+
+
+# ------------------ Clients ------------------
+# Built on first use (one per process), so importing this module doesn't
+# pull in the SDKs or open connection pools for providers never called.
+_groq_client = None
+_gemini_client = None
+_openrouter_client = None
+_clients_lock = threading.Lock()
+
+
+def get_groq_client():
+    global _groq_client
+    with _clients_lock:
+        if _groq_client is None:
+            _groq_client = load("groq").Groq(api_key=os.getenv("GROQ_API_KEY"))
+        return _groq_client
+
+
+def get_gemini_client():
+    global _gemini_client
+    with _clients_lock:
+        if _gemini_client is None:
+            _gemini_client = load("google.genai").Client(api_key=os.getenv("GENAI_API_KEY"))
+        return _gemini_client
+
+
+def get_openrouter_client():
+    """One OpenRouter client (and connection pool) per process."""
+    global _openrouter_client
+    with _clients_lock:
+        if _openrouter_client is None:
+            _openrouter_client = load("openai").OpenAI(
+                base_url="https://openrouter.ai/api/v1",
+                api_key=os.environ.get("OPENROUTER_API_KEY")
+            )
+        return _openrouter_client
+
+
+def call_tracked(key, func):
+    """Runs one model call and records its latency/outcome in the health store."""
+    start = time.perf_counter()
+    try:
+        result = func()
+    except AttemptCancelled:
+        raise
+    except Exception as e:
+        provider_health.record_failure(key, e, time.perf_counter() - start)
+        raise
+    provider_health.record_success(key, time.perf_counter() - start)
+    return result
+
+
+def attempt_timeout(timeout=None, deadline=None, cancel_event=None) -> float:
+    """
+    Seconds the next model call may take, bounded by the per-attempt
+    timeout and the overall deadline. Raises if the attempt was cancelled
+    (another provider won) or the deadline has passed.
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise AttemptCancelled("cancelled: another provider already answered")
+
+    timeout = timeout or LLM_ATTEMPT_TIMEOUT
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("LLM deadline exceeded")
+        timeout = min(timeout, remaining)
+    return timeout
+
 # ------------------ Provider Implementations ------------------
-def generate_openrouter(prompt: str) -> dict:
+def generate_openrouter(prompt: str, cancel_event=None, timeout=None, deadline=None) -> dict:
     """Try multiple free models on OpenRouter until one works"""
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=os.environ.get("OPENROUTER_API_KEY")
-    )
+    client = get_openrouter_client()
     
     last_exception = None
-    for model in OPENROUTER_MODELS:
+    models = provider_health.order(OPENROUTER_MODELS, key=lambda m: f"openrouter/{m}")
+    for model in models:
+        call_timeout = attempt_timeout(timeout, deadline, cancel_event)
         try:
-            response = client.responses.create(
-                model=model,
-                input=prompt,
-            )
-            text = response.output[0].content[0].text
-            return extract_json_safe(text)
+            def call():
+                response = client.with_options(timeout=call_timeout).responses.create(
+                    model=model,
+                    input=prompt,
+                )
+                text = response.output[0].content[0].text
+                return extract_json_safe(text)
+            return call_tracked(f"openrouter/{model}", call)
         except Exception as e:
             last_exception = e
             print(f"OpenRouter model {model} failed: {e}")
     raise RuntimeError(f"All OpenRouter models failed: {last_exception}")
 
-def generate_gemini(prompt: str) -> dict:
+def generate_gemini(prompt: str, cancel_event=None, timeout=None, deadline=None) -> dict:
     """
     Gemini provider with multi-model fallback.
-    Tries several free/preview models in order until one succeeds.
+    Tries the free/preview models, healthiest and fastest first, until one succeeds.
     """
-    # List of Gemini free or preview models
-    models = [
-        "gemini-3-flash-preview",
-        "gemini-2.5-flash",
-        "gemini-2.5-flash-lite",
-        "gemini-2.5-flash-preview-09-2025",
-        "gemini-2.5-flash-lite-preview-09-2025"
-    ]
-    
+    client = get_gemini_client()
+    types = load("google.genai.types")
     last_exception = None
+    models = provider_health.order(GEMINI_MODELS, key=lambda m: f"gemini/{m}")
     
     for model in models:
+        call_timeout = attempt_timeout(timeout, deadline, cancel_event)
         try:
             print(f"Trying Gemini model {model}...")
-            response = gemini_client.models.generate_content(
-                model=model,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
+            def call():
+                response = client.models.generate_content(
+                    model=model,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        response_mime_type="application/json",
+                        http_options=types.HttpOptions(timeout=int(call_timeout * 1000))
+                    )
                 )
-            )
-            return json.loads(response.text)
+                return json.loads(response.text)
+            return call_tracked(f"gemini/{model}", call)
         except Exception as e:
             last_exception = e
             print(f"Gemini model {model} failed → {e}")
@@ -189,33 +271,117 @@ def generate_gemini(prompt: str) -> dict:
     raise RuntimeError(f"All Gemini models failed: {last_exception}")
 
 
-def generate_groq_llama(prompt: str) -> dict:
+def generate_groq_llama(prompt: str, cancel_event=None, timeout=None, deadline=None) -> dict:
     """Groq Free Tier generation"""
+    call_timeout = attempt_timeout(timeout, deadline, cancel_event)
     try:
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=1024
-        )
-        return json.loads(response.choices[0].message.content)
+        client = get_groq_client()
+        def call():
+            response = client.with_options(timeout=call_timeout).chat.completions.create(
+                model="llama-3.3-70b-versatile",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                max_tokens=1024
+            )
+            return json.loads(response.choices[0].message.content)
+        return call_tracked("groq/llama-3.3-70b-versatile", call)
     except Exception as e:
         raise RuntimeError(f"Groq failed: {e}")
 
 # ------------------ Fallback Mechanism ------------------
-def generate_with_fallback(prompt: str) -> dict:
-    """Try multiple providers until one returns valid JSON"""
-    providers = [generate_gemini,generate_groq_llama,generate_openrouter]
+PROVIDERS = [generate_gemini, generate_groq_llama, generate_openrouter]
+
+
+def _attempt(provider, prompt, cancel_event, timeout, deadline):
+    key = f"provider/{provider.__name__}"
+    start = time.perf_counter()
+    try:
+        with span(f"llm:{provider.__name__}", "llm"):
+            result = provider(
+                prompt, cancel_event=cancel_event, timeout=timeout, deadline=deadline
+            )
+        if not result or not isinstance(result, dict):
+            raise ValueError(f"{provider.__name__} returned no JSON object")
+    except AttemptCancelled:
+        raise
+    except Exception as e:
+        provider_health.record_failure(key, e, time.perf_counter() - start, hard=False)
+        raise
+    provider_health.record_success(key, time.perf_counter() - start)
+    return result
+
+
+def generate_with_fallback(prompt: str, hedge_after=None, timeout=None,
+                           overall_deadline=None) -> dict:
+    """
+    Try multiple providers until one returns valid JSON.
+
+    Providers are ordered by their recorded health (see provider_health);
+    those with an open circuit are skipped until their cooldown expires.
+
+    Hedged mode: providers are started in order, and the next one is also
+    started if nothing has answered after hedge_after seconds (or as soon
+    as a running one fails). The first valid JSON wins; the others are
+    cancelled at their next model boundary. Every model call is bounded
+    by timeout and the whole chain by overall_deadline.
+    hedge_after=0 (or LLM_HEDGE_AFTER=off) runs providers strictly in order.
+    """
+    hedge_after = LLM_HEDGE_AFTER if hedge_after is None else hedge_after
+    timeout = timeout or LLM_ATTEMPT_TIMEOUT
+    deadline = time.monotonic() + (overall_deadline or LLM_DEADLINE)
+
+    cancel_event = threading.Event()
+    waiting = provider_health.order(PROVIDERS, key=lambda p: f"provider/{p.__name__}")
+    running = {}
     last_exception = None
-    for provider in providers:
-        try:
-            print(f"Trying {provider.__name__}...")
-            result = provider(prompt)
-            if result and isinstance(result, dict):
-                return result
-        except Exception as e:
-            last_exception = e
-            print(f"{provider.__name__} failed → {e}")
+
+    pool = ThreadPoolExecutor(max_workers=len(PROVIDERS))
+
+    def launch():
+        provider = waiting.pop(0)
+        print(f"Trying {provider.__name__}...")
+        future = pool.submit(_attempt, provider, prompt, cancel_event, timeout, deadline)
+        running[future] = provider
+
+    try:
+        launch()
+        while running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                last_exception = TimeoutError("LLM deadline exceeded")
+                break
+
+            wait_for = remaining
+            if waiting and hedge_after:
+                wait_for = min(hedge_after, remaining)
+
+            done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if waiting and hedge_after:
+                    print(f"⏳ No answer after {hedge_after:g}s, hedging with {waiting[0].__name__}")
+                    launch()
+                continue
+
+            for future in done:
+                provider = running.pop(future)
+                try:
+                    result = future.result()
+                    if running:
+                        print(f"🏁 {provider.__name__} won, cancelling the others")
+                    return result
+                except Exception as e:
+                    last_exception = e
+                    print(f"{provider.__name__} failed → {e}")
+
+            # A provider failed: start the next one straight away
+            if waiting:
+                launch()
+
+    finally:
+        cancel_event.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
     raise RuntimeError(f"All AI providers failed: {last_exception}")
 
 # ------------------ Core Prompt ------------------
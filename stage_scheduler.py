@@ -0,0 +1,179 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from tracing import span
+
+# Small dependency-graph executor for pipeline stages.
+# Every stage declares the artifacts it needs and the artifacts it
+# produces; a stage starts as soon as all of its inputs exist.
+
+
+class Stage:
+    """
+    One pipeline step.
+
+    func is called with the input artifacts as keyword arguments.
+    A single output is stored as the return value; several outputs are
+    taken from a tuple in the same order. A falsy return value is
+    treated as a failure and raises RuntimeError(error).
+    params are the settings baked into func; they are recorded in the run
+    manifest so a resumed run re-executes the stage if they change.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), error=None, params=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.error = error or f"Stage '{name}' failed"
+        self.params = params or {}
+
+
+def _run_stage(stage, kwargs):
+    start = time.perf_counter()
+    with span(stage.name, "stage"):
+        result = stage.func(**kwargs)
+    return result, start, time.perf_counter()
+
+
+def _store_outputs(stage, result, artifacts):
+    """Stores the stage result in artifacts, returns {name: value}."""
+    if not result:
+        raise RuntimeError(stage.error)
+
+    if len(stage.outputs) == 1:
+        outputs = {stage.outputs[0]: result}
+    else:
+        outputs = dict(zip(stage.outputs, result))
+
+    artifacts.update(outputs)
+    return outputs
+
+
+def _validate(stages, artifacts):
+    producers = {}
+    for stage in stages:
+        for out in stage.outputs:
+            if out in producers:
+                raise ValueError(f"Artifact '{out}' produced by more than one stage")
+            producers[out] = stage
+
+    for stage in stages:
+        for inp in stage.inputs:
+            if inp not in producers and inp not in artifacts:
+                raise ValueError(f"Stage '{stage.name}' needs unknown input '{inp}'")
+
+    return producers
+
+
+def critical_path(stages, timings, producers):
+    """
+    Returns the chain of stage names that determined the total run time.
+    timings maps stage name -> (start, end) in seconds.
+    """
+    finished = [s for s in stages if s.name in timings]
+    if not finished:
+        return []
+
+    current = max(finished, key=lambda s: timings[s.name][1])
+    path = [current.name]
+
+    while True:
+        deps = [
+            producers[inp] for inp in current.inputs
+            if inp in producers and producers[inp].name in timings
+        ]
+        if not deps:
+            break
+        current = max(deps, key=lambda s: timings[s.name][1])
+        path.append(current.name)
+
+    return list(reversed(path))
+
+
+def print_stage_report(stages, timings, producers):
+    print(f"\n{'='*60}")
+    print("⏱️ Stage timings")
+    for stage in stages:
+        if stage.name not in timings:
+            continue
+        start, end = timings[stage.name]
+        print(f"   {stage.name:<12} {start:7.2f}s → {end:7.2f}s  ({end - start:.2f}s)")
+
+    path = critical_path(stages, timings, producers)
+    if path:
+        total = timings[path[-1]][1]
+        busy = sum(timings[name][1] - timings[name][0] for name in path)
+        print(f"🧵 Critical path: {' → '.join(path)}")
+        print(f"   Wall time: {total:.2f}s (busy {busy:.2f}s on the path)")
+    print(f"{'='*60}\n")
+
+
+def run_stages(stages, artifacts=None, max_workers=4, manifest=None):
+    """
+    Runs the stages, overlapping every stage whose inputs are ready.
+    Returns the artifacts dict. Raises the first stage error; stages that
+    were already running are allowed to finish first.
+    With a RunManifest, finished stages are checkpointed, and on resume
+    stages whose inputs and outputs are unchanged are skipped.
+    """
+    artifacts = dict(artifacts or {})
+    producers = _validate(stages, artifacts)
+
+    pending = list(stages)
+    running = {}
+    timings = {}
+    failure = None
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            # Skipping a checkpointed stage can make earlier stages ready,
+            # so keep scanning until nothing new starts.
+            progress = failure is None
+            while progress:
+                progress = False
+                for stage in list(pending):
+                    if not all(inp in artifacts for inp in stage.inputs):
+                        continue
+
+                    kwargs = {inp: artifacts[inp] for inp in stage.inputs}
+                    pending.remove(stage)
+                    progress = True
+
+                    restored = manifest.restore(stage, kwargs) if manifest else None
+                    if restored is not None:
+                        artifacts.update(restored)
+                        print(f"⏭️ Skipping stage (unchanged): {stage.name}")
+                        continue
+
+                    print(f"▶️ Starting stage: {stage.name}")
+                    running[pool.submit(_run_stage, stage, kwargs)] = (stage, kwargs)
+
+            if not running:
+                if failure is None and pending:
+                    names = ", ".join(s.name for s in pending)
+                    failure = RuntimeError(f"Stages can never run: {names}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, kwargs = running.pop(future)
+                try:
+                    result, start, end = future.result()
+                    timings[stage.name] = (start - t0, end - t0)
+                    outputs = _store_outputs(stage, result, artifacts)
+                    if manifest:
+                        manifest.record(stage, kwargs, outputs)
+                    print(f"✅ Stage done: {stage.name} ({end - start:.2f}s)")
+                except Exception as e:
+                    print(f"❌ Stage failed: {stage.name} → {e}")
+                    if failure is None:
+                        failure = e
+
+    print_stage_report(stages, timings, producers)
+
+    if failure is not None:
+        raise failure
+
+    return artifacts
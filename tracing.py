@@ -0,0 +1,212 @@
+import functools
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+# Lightweight per-run tracing.
+# span() records wall time, CPU time, peak RSS and bytes read/written for a
+# block of code. Spans can be exported as a Chrome trace event file
+# (open in chrome://tracing or https://ui.perfetto.dev) and as a JSON
+# summary aggregated by span name.
+#
+# CPU time, I/O bytes (Linux only) and child CPU (finished ffmpeg/ffprobe
+# processes) are process-wide deltas, so work done in pool threads, in
+# Whisper/torch threads and in subprocesses is counted. When spans of the
+# same category overlap (parallel stages, hedged LLM attempts) each of them
+# sees the others' work too; such spans are marked "shared" and their
+# numbers are an upper bound. Peak RSS is the process high-water mark at
+# the end of the span.
+
+TRACE_DIR = os.getenv("YT_TRACE_DIR", "traces")
+
+_events = []
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+# Spans still running, by category: {category: {span_id: shared_flag_dict}}
+_active = {}
+
+
+def reset():
+    """Drops all recorded spans (call at the start of a run)."""
+    global _origin
+    with _lock:
+        _events.clear()
+        _origin = time.perf_counter()
+
+
+def _process_io():
+    """(bytes_read, bytes_written) of this process, or (None, None)."""
+    try:
+        with open("/proc/self/io", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _process_cpu():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, children
+
+
+@contextmanager
+def span(name, category="stage", **args):
+    """
+    Records one span. Yields a dict; keys added to it end up in the
+    span's args (e.g. span_args["model"] = "...").
+    """
+    extra = dict(args)
+    shared = {"shared": False}
+    with _lock:
+        running = _active.setdefault(category, {})
+        for other in running.values():
+            other["shared"] = True
+        shared["shared"] = bool(running)
+        running[id(shared)] = shared
+
+    read0, write0 = _process_io()
+    wall0 = time.perf_counter()
+    cpu0 = _process_cpu()
+    child0 = _children_cpu()
+    status = "ok"
+
+    try:
+        yield extra
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        wall1 = time.perf_counter()
+        cpu = _process_cpu() - cpu0
+        child_cpu = _children_cpu() - child0
+        read1, write1 = _process_io()
+        rss, child_rss = _peak_rss_mb()
+        with _lock:
+            _active[category].pop(id(shared), None)
+
+        extra.update({
+            "status": status,
+            "wall_s": round(wall1 - wall0, 4),
+            "cpu_s": round(cpu, 4),
+            "child_cpu_s": round(child_cpu, 4),
+            "peak_rss_mb": round(rss, 1),
+            "child_peak_rss_mb": round(child_rss, 1),
+            "bytes_read": read1 - read0 if read0 is not None else None,
+            "bytes_written": write1 - write0 if write0 is not None else None,
+            "shared": shared["shared"],
+        })
+
+        with _lock:
+            _events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((wall0 - _origin) * 1_000_000),
+                "dur": round((wall1 - wall0) * 1_000_000),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": extra,
+            })
+
+
+def traced(name=None, category="stage"):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def events():
+    with _lock:
+        return list(_events)
+
+
+def summarize():
+    """Aggregates spans by name: count, wall/CPU totals, peaks and I/O."""
+    summary = {}
+    for event in events():
+        a = event["args"]
+        s = summary.setdefault(event["name"], {
+            "category": event["cat"],
+            "count": 0,
+            "errors": 0,
+            "wall_s": 0.0,
+            "cpu_s": 0.0,
+            "child_cpu_s": 0.0,
+            "peak_rss_mb": 0.0,
+            "bytes_read": 0,
+            "bytes_written": 0,
+            "shared": 0,
+        })
+        s["count"] += 1
+        s["errors"] += a["status"] != "ok"
+        s["wall_s"] += a["wall_s"]
+        s["cpu_s"] += a["cpu_s"]
+        s["child_cpu_s"] += a["child_cpu_s"]
+        s["peak_rss_mb"] = max(s["peak_rss_mb"], a["peak_rss_mb"], a["child_peak_rss_mb"])
+        s["bytes_read"] += a["bytes_read"] or 0
+        s["bytes_written"] += a["bytes_written"] or 0
+        s["shared"] += a.get("shared", False)
+    return summary
+
+
+def export(run_id, trace_dir=None):
+    """
+    Writes <trace_dir>/<run_id>.trace.json (Chrome trace events) and
+    <trace_dir>/<run_id>.summary.json. Returns the two paths.
+    """
+    trace_dir = trace_dir or TRACE_DIR
+    os.makedirs(trace_dir, exist_ok=True)
+
+    trace_path = os.path.join(trace_dir, f"{run_id}.trace.json")
+    summary_path = os.path.join(trace_dir, f"{run_id}.summary.json")
+
+    with open(trace_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events(), "displayTimeUnit": "ms"}, f)
+
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump({"run_id": run_id, "spans": summarize()}, f, indent=2)
+
+    print(f"🧭 Trace written: {trace_path}")
+    print(f"🧭 Summary written: {summary_path}")
+    return trace_path, summary_path
+
+
+def print_summary():
+    summary = summarize()
+    if not summary:
+        return
+
+    print(f"\n{'='*60}")
+    print("🧭 Trace summary (sorted by wall time)")
+    for name, s in sorted(summary.items(), key=lambda kv: -kv[1]["wall_s"]):
+        print(
+            f"   {name:<28} x{s['count']:<2} wall {s['wall_s']:7.2f}s  "
+            f"cpu {s['cpu_s']:6.2f}s  child cpu {s['child_cpu_s']:6.2f}s  "
+            f"rss {s['peak_rss_mb']:7.1f} MB  "
+            f"io {s['bytes_read'] / 1e6:.1f}/{s['bytes_written'] / 1e6:.1f} MB"
+            f"{'  *' if s['shared'] else ''}"
+        )
+    if any(s["shared"] for s in summary.values()):
+        print("   * overlapped other spans: cpu/io are process-wide and include their work")
+    print(f"{'='*60}\n")
@@ -1,29 +1,69 @@
 import subprocess
-import json
 import os
 
+from media_probe import get_duration
 
-def get_duration(file_path: str) -> float:
-    """Return duration in seconds using ffprobe."""
-    cmd = [
-        "ffprobe", "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "json",
-        file_path
-    ]
+# Video this close to the audio needs no speed-up or trim: a tiny shortfall
+# is invisible, and a small overrun (stream-copied clips stop on packet
+# boundaries) is cut by -shortest when the audio is muxed
+FIT_TOLERANCE = 0.05
+OVERRUN_TOLERANCE = 0.5
 
-    result = subprocess.run(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
 
-    if result.returncode != 0:
-        raise RuntimeError(result.stderr)
+def plan_clip_budgets(clip_durations, target_duration):
+    """
+    Seconds to take from the start of each clip so the clips add up to
+    exactly target_duration (water-filling: every clip gets an equal share,
+    clips shorter than their share are used whole and the rest is spread
+    over the longer ones). Returns None if the clips are too short overall.
+    """
+    if not clip_durations or sum(clip_durations) < target_duration:
+        return None
+
+    budgets = [0.0] * len(clip_durations)
+    remaining = target_duration
+    order = sorted(range(len(clip_durations)), key=lambda i: clip_durations[i])
+
+    for n, i in enumerate(order):
+        share = remaining / (len(order) - n)
+        budgets[i] = min(clip_durations[i], share)
+        remaining -= budgets[i]
+
+    return budgets
+
+
+def decide_speed_and_trim(video_dur: float, audio_dur: float):
+    """
+    Decide how to fit a video of video_dur seconds to audio_dur seconds.
+    Returns (speed, trim_end).
+    """
+    speed = 1.0
+    trim_end = None
+
+    if -FIT_TOLERANCE <= video_dur - audio_dur <= OVERRUN_TOLERANCE:
+        print("🎯 Video already matches audio → no speed-up or trim")
+        return speed, trim_end
+
+    if video_dur < audio_dur:
+        print("⚡ Video shorter than audio → trying speed-up")
 
-    data = json.loads(result.stdout)
-    return float(data["format"]["duration"])
+        if video_dur * 1.2 >= audio_dur:
+            speed = 1.2
+            trim_end = audio_dur
+        elif video_dur * 1.25 >= audio_dur:
+            speed = 1.25
+            trim_end = audio_dur
+        else:
+            speed = 1.25
+            trim_end = audio_dur
+            print("⚠️ Even 1.25x not enough, trimming anyway")
+
+    else:
+        print("✂️ Video longer than audio → trimming video")
+        trim_end = audio_dur
+
+    print(f"🎛️ Final settings → speed={speed}, trim_end={trim_end:.2f}s")
+    return speed, trim_end
 
 
 def trim_vedio_to_audio_length(
@@ -55,46 +95,31 @@ def trim_vedio_to_audio_length(
         print(f"🎞️ Video duration: {video_dur:.2f}s")
         print(f"🎵 Audio duration: {audio_dur:.2f}s")
 
-        # Decide speed / trim
-        speed = 1.0
-        trim_end = None
-
-        if video_dur < audio_dur:
-            print("⚡ Video shorter than audio → trying speed-up")
-
-            if video_dur * 1.2 >= audio_dur:
-                speed = 1.2
-                trim_end = audio_dur
-            elif video_dur * 1.25 >= audio_dur:
-                speed = 1.25
-                trim_end = audio_dur
-            else:
-                speed = 1.25
-                trim_end = audio_dur
-                print("⚠️ Even 1.25x not enough, trimming anyway")
+        speed, trim_end = decide_speed_and_trim(video_dur, audio_dur)
 
+        if speed == 1.0 and not trim_end:
+            # Merged to the audio length already: keep the video stream as is
+            video_args = ["-c:v", "copy"]
         else:
-            print("✂️ Video longer than audio → trimming video")
-            trim_end = audio_dur
-
-        print(f"🎛️ Final settings → speed={speed}, trim_end={trim_end:.2f}s")
-
-        # Build video filter
-        setpts_filter = f"setpts={1/speed}*PTS"
-        if trim_end:
-            setpts_filter += f",trim=0:{trim_end}"
+            # Build video filter
+            setpts_filter = f"setpts={1/speed}*PTS"
+            if trim_end:
+                setpts_filter += f",trim=0:{trim_end}"
+            video_args = [
+                "-filter:v", setpts_filter,
+                "-c:v", "libx264",
+                "-preset", "ultrafast",
+                "-crf", "23",
+            ]
 
         cmd = [
             "ffmpeg",
             "-y",
             "-i", video_path,
             "-i", audio_path,
-            "-filter:v", setpts_filter,
             "-map", "0:v",
             "-map", "1:a",
-            "-c:v", "libx264",
-            "-preset", "ultrafast",
-            "-crf", "23",
+            *video_args,
             "-c:a", "aac",
             "-shortest",
             output_path
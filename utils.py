@@ -1,13 +1,28 @@
 import shutil
-from script_generator import chunks_to_pexels_titles
-from moviepy import AudioFileClip
+from chunk_planner import estimate_duration, clip_count
+from lazy_imports import load
+from media_probe import get_duration
 import math
 import os
 
 
 def generate_pexels_title_from_audio_and_text(audio_path, script):
     duration = get_audio_duration(audio_path)
-    total_videos  = math.ceil(duration / 10)  # 1 vedio per 10 sec
+    return generate_pexels_titles_for_duration(script, duration)
+
+
+def generate_pexels_title_from_script(script, voice):
+    """
+    Same as generate_pexels_title_from_audio_and_text, but uses the
+    predicted narration length so it can run while TTS is still going.
+    """
+    duration = estimate_duration(script, voice)
+    print(f"==== Estimated narration length: {duration:.1f}s")
+    return generate_pexels_titles_for_duration(script, duration)
+
+
+def generate_pexels_titles_for_duration(script, duration):
+    total_videos  = clip_count(duration)  # 1 vedio per 10 sec
 
     # Split into exactly 'total_videos' parts
     print("==== Splitting Content into Chuncks to Generate bg vedio form")
@@ -16,12 +31,11 @@ def generate_pexels_title_from_audio_and_text(audio_path, script):
     chunks = [" ".join(words[i:i + words_per_video]) 
               for i in range(0, len(words), words_per_video)][:total_videos]
     print("====chuncks made=====")
-    titles =  chunks_to_pexels_titles(chunks)
+    titles =  load("script_generator").chunks_to_pexels_titles(chunks)
     return titles
 
 def get_audio_duration(audio_path):
-    with AudioFileClip(audio_path) as audio:
-        return audio.duration
+    return get_duration(audio_path)
     
 def cleanup_paths(*paths):
     """
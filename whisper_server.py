@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+# Long-lived Whisper transcription worker.
+# Loads each model once and serves transcription jobs over a local TCP
+# socket (one JSON request per line, one JSON response per line), so batch
+# and daemon runs don't pay the model/torch load for every reel.
+#
+#   python whisper_server.py --model base
+#
+# add_subtitle_to_vedio uses it automatically when it is reachable at
+# WHISPER_SERVER_ADDR (default 127.0.0.1:8765).
+
+WHISPER_SERVER_ADDR = os.getenv("WHISPER_SERVER_ADDR", "127.0.0.1:8765")
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+# ------------------ Model cache ------------------
+def load_whisper_model(name="base"):
+    """Loads a Whisper model once per process and reuses it afterwards."""
+    with _models_lock:
+        if name not in _models:
+            import whisper
+            print(f"🧠 Loading Whisper model: {name}")
+            _models[name] = whisper.load_model(name)
+        return _models[name]
+
+
+def result_to_words(result):
+    """Flattens a Whisper result into a list of {"word", "start", "end"}."""
+    return [
+        {"word": w["word"], "start": w["start"], "end": w["end"]}
+        for segment in result.get("segments", [])
+        for w in segment.get("words", [])
+    ]
+
+
+def transcribe_local(audio_path, whisper_model="base", language="en", **options):
+    model = load_whisper_model(whisper_model)
+    result = model.transcribe(
+        audio_path,
+        word_timestamps=True,
+        language=language,
+        **options
+    )
+    return result_to_words(result)
+
+
+# ------------------ Server ------------------
+class TranscriptionWorker:
+    """Single thread draining the job queue; keeps latency counters."""
+
+    def __init__(self, default_model="base", history=200):
+        self.default_model = default_model
+        self.jobs = queue.Queue()
+        self.history = history
+        self.latencies = []
+        self.stats = {"done": 0, "failed": 0, "max_queue_depth": 0}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        load_whisper_model(self.default_model)
+        self._thread.start()
+
+    def submit(self, request):
+        job = {"request": request, "done": threading.Event(), "queued_at": time.perf_counter()}
+        self.jobs.put(job)
+        with self._lock:
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.jobs.qsize())
+        job["done"].wait()
+        return job["response"]
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            request = job["request"]
+            started = time.perf_counter()
+            try:
+                words = transcribe_local(
+                    request["audio_path"],
+                    request.get("model") or self.default_model,
+                    request.get("language", "en"),
+                    **request.get("options", {})
+                )
+                response = {"ok": True, "words": words}
+                stat = "done"
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+                stat = "failed"
+
+            finished = time.perf_counter()
+            response["latency"] = finished - started
+            response["queue_wait"] = started - job["queued_at"]
+
+            with self._lock:
+                self.stats[stat] += 1
+                self.latencies = (self.latencies + [finished - started])[-self.history:]
+
+            job["response"] = response
+            job["done"].set()
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            stats = dict(self.stats)
+
+        def pct(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        stats.update({
+            "queue_depth": self.jobs.qsize(),
+            "latency_p50": pct(0.50),
+            "latency_p95": pct(0.95),
+            "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+            "models": sorted(_models),
+        })
+        return stats
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request.get("op", "transcribe")
+                if op == "stats":
+                    response = {"ok": True, "stats": self.server.worker.snapshot()}
+                elif op == "transcribe":
+                    response = self.server.worker.submit(request)
+                else:
+                    response = {"ok": False, "error": f"Unknown op: {op}"}
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(host="127.0.0.1", port=8765, model="base"):
+    worker = TranscriptionWorker(model)
+    worker.start()
+
+    with _Server((host, port), _Handler) as server:
+        server.worker = worker
+        print(f"🎧 Whisper server ready on {host}:{port} (model: {model})")
+        server.serve_forever()
+
+
+# ------------------ Client ------------------
+def _parse_addr(address):
+    host, _, port = (address or WHISPER_SERVER_ADDR).rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class ServerUnavailable(ConnectionError):
+    """No Whisper server is listening at the address."""
+
+
+def _connect(address=None):
+    try:
+        return socket.create_connection(_parse_addr(address), timeout=0.5)
+    except OSError as e:
+        raise ServerUnavailable(str(e)) from e
+
+
+def _request(payload, address=None, timeout=600):
+    with _connect(address) as sock:
+        sock.settimeout(timeout)
+        sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("Whisper server closed the connection")
+    return json.loads(line)
+
+
+def transcribe_via_server(audio_path, whisper_model="base", language="en",
+                          address=None, timeout=600, **options):
+    """
+    Sends a transcription job to a running whisper_server.
+    Returns the word list, or None if no server is reachable.
+    Raises RuntimeError if the server failed the job, or if the connection
+    timed out or dropped mid-job (the server may still be working on it,
+    so falling back to a local transcription would duplicate the work).
+    """
+    payload = {
+        "op": "transcribe",
+        "audio_path": os.path.abspath(audio_path),
+        "model": whisper_model,
+        "language": language,
+        "options": options,
+    }
+    try:
+        response = _request(payload, address, timeout)
+    except ServerUnavailable:
+        return None
+    except socket.timeout as e:
+        print(f"⏳ Whisper server did not answer within {timeout}s")
+        raise RuntimeError(f"Whisper server timed out mid-job: {e}") from e
+    except (OSError, ValueError) as e:
+        print(f"🔌 Lost the Whisper server connection mid-job: {e}")
+        raise RuntimeError(f"Whisper server connection lost mid-job: {e}") from e
+
+    if not response.get("ok"):
+        raise RuntimeError(f"Whisper server error: {response.get('error')}")
+
+    print(
+        f"🎧 Transcribed by Whisper server in {response['latency']:.2f}s "
+        f"(queued {response['queue_wait']:.2f}s)"
+    )
+    return response["words"]
+
+
+def server_stats(address=None):
+    """Returns the server counters, or None if no server is reachable."""
+    try:
+        return _request({"op": "stats"}, address, timeout=10).get("stats")
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident Whisper transcription server")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--addr", default=WHISPER_SERVER_ADDR, help="host:port to listen on")
+    args = parser.parse_args()
+
+    host, port = _parse_addr(args.addr)
+    serve(host, port, args.model)
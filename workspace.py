@@ -0,0 +1,123 @@
+import os
+import re
+import shutil
+import time
+import uuid
+
+from run_manifest import MANIFEST_NAME
+
+# Every pipeline run gets its own directory so several runs can share a
+# host (or a process pool) without overwriting each other's files.
+
+WORKSPACE_ROOT = os.getenv("YT_WORKSPACE_ROOT", "runs")
+
+# Failed runs keep their workspace for --resume; these cap how many (and
+# for how long). Workspaces touched within ACTIVE_GRACE_SECONDS may belong
+# to a pipeline that is still running and are never pruned.
+WORKSPACE_KEEP = int(os.getenv("YT_WORKSPACE_KEEP", "5"))
+WORKSPACE_MAX_AGE_HOURS = float(os.getenv("YT_WORKSPACE_MAX_AGE_HOURS", "72"))
+ACTIVE_GRACE_SECONDS = 3600
+
+# Matches new_run_id(): only such directories are ever resumed or pruned
+RUN_ID_PATTERN = re.compile(r"^\d{8}-\d{6}-\d+-[0-9a-f]{6}$")
+
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def list_run_ids(root=None) -> list:
+    """
+    Ids of the run workspaces under root: directories named like
+    new_run_id() that hold a run manifest. Anything else sharing the
+    root (a checkout, other data) is never treated as a workspace.
+    """
+    root = root or WORKSPACE_ROOT
+    if not os.path.isdir(root):
+        return []
+    return [
+        name for name in os.listdir(root)
+        if RUN_ID_PATTERN.match(name)
+        and os.path.isfile(os.path.join(root, name, MANIFEST_NAME))
+    ]
+
+
+def create_workspace(run_id=None, root=None) -> dict:
+    """
+    Creates (or reopens) the workspace directory for one run.
+    Returns a dict with the run id, the directory and the path of every
+    file the pipeline stages read or write.
+    """
+    run_id = run_id or new_run_id()
+    path = os.path.join(root or WORKSPACE_ROOT, run_id)
+    os.makedirs(path, exist_ok=True)
+
+    def p(name):
+        return os.path.join(path, name)
+
+    return {
+        "run_id": run_id,
+        "root": path,
+        "audio": p("audio_reel.mp3"),
+        "word_timings": p("word_timings.json"),
+        "clips_dir": p("reel_vedios"),
+        "ass": p("tiktok_style.ass"),
+        "srt": p("captions.srt"),
+        "final": p("final_vedio.mp4"),
+    }
+
+
+def latest_run_id(root=None):
+    """Returns the id of the most recently modified workspace, or None."""
+    root = root or WORKSPACE_ROOT
+    runs = list_run_ids(root)
+    if not runs:
+        return None
+
+    return max(runs, key=lambda name: os.path.getmtime(os.path.join(root, name)))
+
+
+def _last_touched(path) -> float:
+    """Newest mtime of the workspace directory and the entries in it."""
+    times = [os.path.getmtime(path)]
+    for entry in os.scandir(path):
+        try:
+            times.append(entry.stat().st_mtime)
+        except OSError:
+            pass
+    return max(times)
+
+
+def prune_workspaces(root=None, keep=None, max_age_hours=None, exclude=()) -> list:
+    """
+    Removes stale workspaces left behind by failed runs: everything older
+    than max_age_hours, and all but the newest keep of the rest.
+    Workspaces in exclude or touched within the last hour are left alone.
+    Returns the removed run ids.
+    """
+    root = root or WORKSPACE_ROOT
+    keep = WORKSPACE_KEEP if keep is None else keep
+    max_age_hours = WORKSPACE_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+    now = time.time()
+    runs = []
+    for name in list_run_ids(root):
+        path = os.path.join(root, name)
+        if name in exclude:
+            continue
+        try:
+            touched = _last_touched(path)
+        except OSError:
+            continue
+        if now - touched >= ACTIVE_GRACE_SECONDS:
+            runs.append((touched, name))
+
+    runs.sort(reverse=True)
+    removed = []
+    for i, (touched, name) in enumerate(runs):
+        if i >= keep or now - touched > max_age_hours * 3600:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+            removed.append(name)
+
+    if removed:
+        print(f"🧹 Pruned {len(removed)} stale workspace(s) from {root}")
+    return removed
@@ -1,12 +1,18 @@
 import os
+import json
 import pickle
 import base64
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
 from dotenv import load_dotenv
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.errors import HttpError
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+
+from disk_cache import CACHE_DIR, make_key
+from lazy_imports import load
+from run_manifest import file_sha256
+from tracing import span
 
 load_dotenv()
 
@@ -18,61 +24,347 @@ CLIENT_SECRET_PICKLE_BASE64 = os.getenv("CLIENT_SECRET_PICKLE_BASE64")
 BASE64_FILE_PATH = "token_base64.txt"
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 
+# Point the client at another host (e.g. a local stand-in for the upload
+# endpoint) instead of https://www.googleapis.com/
+YOUTUBE_API_ENDPOINT = os.getenv("YOUTUBE_API_ENDPOINT")
+
+# Resumable uploads: chunk size must be a multiple of 256 KiB
+CHUNK_ALIGN = 256 * 1024
+UPLOAD_CHUNK_MB = float(os.getenv("YT_UPLOAD_CHUNK_MB", "8"))
+UPLOAD_MAX_RETRIES = int(os.getenv("YT_UPLOAD_MAX_RETRIES", "8"))
+UPLOAD_BACKOFF_CAP = 64  # seconds
+RETRIABLE_STATUS = {500, 502, 503, 504}
+STALE_SESSION_STATUS = {404, 410}
+
+# One JSON file per in-flight upload: resumable session URI + progress
+UPLOAD_STATE_DIR = os.path.join(CACHE_DIR, "uploads")
+
+# Opt-in for long-lived hosts: refreshed credentials are written back to
+# this JSON file so later runs start with a valid access token. It holds
+# the refresh token and client secret, so it must live outside any cached
+# or shared directory (never under .cache/, which CI restores across runs).
+TOKEN_CACHE_FILE = os.getenv("YT_TOKEN_CACHE")
+REFRESH_MARGIN = timedelta(minutes=5)  # refresh this long before expiry
+
+# Built once per process and reused by every upload (batch mode)
+_youtube_service = None
+_youtube_creds = None
+_service_lock = threading.Lock()
+
 # -------------------------------
 # Authentication
 # -------------------------------
-def get_authenticated_service():
+def load_credentials():
     creds = None
 
-    try:
-        # 1️⃣ Load credentials from local base64 file (optional)
-        if os.path.exists(BASE64_FILE_PATH):
-            with open(BASE64_FILE_PATH, "r") as f:
-                base64_str = f.read().strip()
-                pickle_bytes = base64.b64decode(base64_str)
-                creds = pickle.loads(pickle_bytes)
-                print("✅ Loaded credentials from base64 file")
-
-        # 2️⃣ Load from environment variable (GitHub secret)
-        elif CLIENT_SECRET_PICKLE_BASE64:
-            pickle_bytes = base64.b64decode(CLIENT_SECRET_PICKLE_BASE64)
+    # 1️⃣ Load credentials from local base64 file (optional)
+    if os.path.exists(BASE64_FILE_PATH):
+        with open(BASE64_FILE_PATH, "r") as f:
+            base64_str = f.read().strip()
+            pickle_bytes = base64.b64decode(base64_str)
             creds = pickle.loads(pickle_bytes)
-            print("✅ Loaded credentials from env variable")
+            print("✅ Loaded credentials from base64 file")
 
-        # 3️⃣ Load from local token.pickle
-        elif os.path.exists("token.pickle"):
-            with open("token.pickle", "rb") as f:
-                creds = pickle.load(f)
-                print("✅ Loaded credentials from token.pickle")
+    # 2️⃣ Load from environment variable (GitHub secret)
+    elif CLIENT_SECRET_PICKLE_BASE64:
+        pickle_bytes = base64.b64decode(CLIENT_SECRET_PICKLE_BASE64)
+        creds = pickle.loads(pickle_bytes)
+        print("✅ Loaded credentials from env variable")
 
-        else:
-            raise Exception("❌ No credentials found. Please generate token.pickle locally.")
+    # 3️⃣ Load from local token.pickle
+    elif os.path.exists("token.pickle"):
+        with open("token.pickle", "rb") as f:
+            creds = pickle.load(f)
+            print("✅ Loaded credentials from token.pickle")
 
-        # Refresh expired token
-        if creds and creds.expired and creds.refresh_token:
-            print("🔄 Refreshing token...")
-            creds.refresh(Request())
-            print("✅ Token refreshed successfully")
+    else:
+        raise Exception("❌ No credentials found. Please generate token.pickle locally.")
 
-        # Validate credentials
-        if not creds or not creds.valid:
-            raise Exception("❌ Credentials invalid after refresh")
+    # 4️⃣ Prefer the token saved after the last refresh, as long as it
+    # belongs to the same grant (a rotated secret wins over the cache)
+    cached = load_cached_credentials()
+    if cached is not None and creds is not None \
+            and getattr(cached, "refresh_token", None) == getattr(creds, "refresh_token", None) \
+            and getattr(cached, "client_id", None) == getattr(creds, "client_id", None):
+        print("✅ Using refreshed token from cache")
+        creds = cached
 
-        # Build YouTube service
-        youtube = build("youtube", "v3", credentials=creds)
-        return youtube
+    return creds
 
-    except Exception as e:
-        print("🚨 AUTHENTICATION FAILED")
-        print(e)
+
+def token_cache_path():
+    """The token cache file, or None if disabled or inside the data cache."""
+    if not TOKEN_CACHE_FILE:
+        return None
+    path = os.path.abspath(TOKEN_CACHE_FILE)
+    cache_dir = os.path.abspath(CACHE_DIR)
+    if os.path.commonpath([path, cache_dir]) == cache_dir:
+        print(f"⚠️ YT_TOKEN_CACHE is inside {CACHE_DIR}/ → token cache disabled")
+        return None
+    return path
+
+
+def load_cached_credentials():
+    path = token_cache_path()
+    if not path:
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        credentials = load("google.oauth2.credentials")
+        return credentials.Credentials.from_authorized_user_info(info, SCOPES)
+    except Exception:
+        return None
+
+
+def save_credentials(creds):
+    """Atomically writes the credentials to the token cache (owner-only)."""
+    path = token_cache_path()
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(creds.to_json())
+    os.replace(tmp, path)
+
+
+def needs_refresh(creds) -> bool:
+    """True if the token is invalid or expires within REFRESH_MARGIN."""
+    if not creds.refresh_token:
+        return False
+    if not creds.valid:
+        return True
+    if creds.expiry is None:
+        return False
+    # google-auth keeps expiry as a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return creds.expiry - now < REFRESH_MARGIN
+
+
+def refresh_if_needed(creds):
+    if needs_refresh(creds):
+        print("🔄 Refreshing token...")
+        creds.refresh(load("google.auth.transport.requests").Request())
+        save_credentials(creds)
+        print("✅ Token refreshed successfully")
+    return creds
+
+
+def get_authenticated_service():
+    """
+    One YouTube service per process, shared by every upload. Credentials
+    are refreshed ahead of expiry (also for the cached service); with
+    YT_TOKEN_CACHE set, the refreshed token is saved for the next run.
+    """
+    global _youtube_service, _youtube_creds
+
+    with _service_lock:
+        if _youtube_service is not None:
+            try:
+                refresh_if_needed(_youtube_creds)
+            except Exception as e:
+                print(f"⚠️ Token refresh failed, keeping current token: {e}")
+            return _youtube_service
+
+        try:
+            creds = load_credentials()
+            refresh_if_needed(creds)
+
+            # Validate credentials
+            if not creds or not creds.valid:
+                raise Exception("❌ Credentials invalid after refresh")
+
+            # Build YouTube service from the discovery document bundled with
+            # the client library (no network fetch, no file cache)
+            client_options = {"api_endpoint": YOUTUBE_API_ENDPOINT} if YOUTUBE_API_ENDPOINT else None
+            youtube = load("googleapiclient.discovery").build(
+                "youtube", "v3", credentials=creds, client_options=client_options,
+                static_discovery=True, cache_discovery=False
+            )
+            _youtube_service = youtube
+            _youtube_creds = creds
+            return youtube
+
+        except Exception as e:
+            print("🚨 AUTHENTICATION FAILED")
+            print(e)
+            return None
+
+# -------------------------------
+# Resumable upload helpers
+# -------------------------------
+def aligned_chunk_size(chunk_mb=None) -> int:
+    """Chunk size in bytes, rounded to a multiple of 256 KiB."""
+    chunk_bytes = (chunk_mb or UPLOAD_CHUNK_MB) * 1024 * 1024
+    return max(1, round(chunk_bytes / CHUNK_ALIGN)) * CHUNK_ALIGN
+
+
+def point_at_endpoint(request):
+    """
+    client_options only swaps the host of the media upload URL and keeps
+    https; use the scheme of YOUTUBE_API_ENDPOINT too, so a plain-HTTP
+    local stand-in works.
+    """
+    if YOUTUBE_API_ENDPOINT:
+        endpoint = urlparse(YOUTUBE_API_ENDPOINT)
+        request.uri = urlparse(request.uri)._replace(
+            scheme=endpoint.scheme, netloc=endpoint.netloc
+        ).geturl()
+    return request
+
+
+def backoff_delay(attempt) -> float:
+    """Exponential backoff with full jitter: up to 1, 2, 4 ... seconds (capped)."""
+    return random.uniform(0, min(UPLOAD_BACKOFF_CAP, 2 ** attempt))
+
+
+def upload_state_path(file_path, body):
+    """The same file with the same metadata maps to the same state file."""
+    key = make_key("youtube_upload", file_sha256(file_path), json.dumps(body, sort_keys=True))
+    return os.path.join(UPLOAD_STATE_DIR, f"{key}.json")
+
+
+def load_upload_state(state_path):
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
         return None
 
+
+def save_upload_state(state_path, state):
+    os.makedirs(UPLOAD_STATE_DIR, exist_ok=True)
+    tmp = f"{state_path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, state_path)
+
+
+def clear_upload_state(state_path):
+    try:
+        os.remove(state_path)
+    except OSError:
+        pass
+
+
+def is_retriable(error, HttpError) -> bool:
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRIABLE_STATUS
+    # Dropped connections, timeouts, DNS hiccups
+    return isinstance(error, (OSError, load("httplib2").HttpLib2Error))
+
+
+def query_upload_status(request, file_size, HttpError):
+    """
+    Asks the server how much of the resumable session it already has
+    (an empty PUT with "Content-Range: bytes */<size>", as the resumable
+    upload protocol specifies) and moves request.resumable_progress to
+    the first missing byte.
+    Returns the API response if the upload had already completed, else None.
+    Raises HttpError (404/410 when the session has expired).
+    """
+    headers = {"Content-Range": f"bytes */{file_size}", "Content-Length": "0"}
+    resp, content = request.http.request(request.resumable_uri, "PUT", headers=headers)
+    if resp.status in (200, 201):
+        return request.postproc(resp, content)
+    if resp.status != 308:
+        raise HttpError(resp, content, uri=request.resumable_uri)
+
+    byte_range = resp.get("range")
+    request.resumable_progress = int(byte_range.rsplit("-", 1)[1]) + 1 if byte_range else 0
+    if "location" in resp:
+        request.resumable_uri = resp["location"]
+    return None
+
+
+def run_resumable_upload(request, state_path, file_size, HttpError):
+    """
+    Sends the upload chunk by chunk. Progress (session URI + acknowledged
+    bytes) is saved after every chunk; on a retriable error we back off
+    and ask the server how many bytes it has before sending the rest.
+    Returns the API response.
+    """
+    state = load_upload_state(state_path)
+    # Set whenever the server's view of the session has to be queried
+    # before the next chunk: a session from an earlier process, or a retry
+    query_status = False
+    if state and state.get("resumable_uri"):
+        request.resumable_uri = state["resumable_uri"]
+        query_status = True
+        print(f"🔁 Resuming upload from {state.get('progress', 0) / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    start_progress = None
+    attempt = 0
+    response = None
+
+    while response is None:
+        try:
+            status = None
+            if query_status:
+                response = query_upload_status(request, file_size, HttpError)
+                query_status = False
+            if response is None:
+                status, response = request.next_chunk()
+            attempt = 0
+        except Exception as e:
+            if isinstance(e, HttpError) and e.resp.status in STALE_SESSION_STATUS \
+                    and state and request.resumable_uri == state.get("resumable_uri"):
+                # Saved session expired on the server: start a new one
+                print("⚠️ Saved upload session expired, starting over")
+                clear_upload_state(state_path)
+                state = None
+                request.resumable_uri = None
+                request.resumable_progress = 0
+                query_status = False
+                continue
+
+            if not is_retriable(e, HttpError) or attempt >= UPLOAD_MAX_RETRIES:
+                raise
+            attempt += 1
+            delay = backoff_delay(attempt)
+            print(f"⚠️ Upload error ({e}); retry {attempt}/{UPLOAD_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+            query_status = request.resumable_uri is not None
+            continue
+
+        if start_progress is None:
+            # Bytes acknowledged before this process started sending
+            start_progress = state.get("progress", 0) if state else 0
+
+        if status:
+            state = {"resumable_uri": request.resumable_uri,
+                     "progress": status.resumable_progress}
+            save_upload_state(state_path, state)
+
+            elapsed = time.perf_counter() - start
+            sent = status.resumable_progress - start_progress
+            rate = sent / elapsed / 1e6 if elapsed > 0 else 0.0
+            print(
+                f"Uploading... {int(status.progress() * 100)}% "
+                f"({status.resumable_progress / 1e6:.1f}/{file_size / 1e6:.1f} MB, "
+                f"{rate:.2f} MB/s)"
+            )
+
+    elapsed = time.perf_counter() - start
+    sent = file_size - (start_progress or 0)
+    print(f"📤 Uploaded {sent / 1e6:.1f} MB in {elapsed:.1f}s "
+          f"({sent / elapsed / 1e6 if elapsed > 0 else 0.0:.2f} MB/s)")
+    clear_upload_state(state_path)
+    return response, sent, elapsed
+
+
 # -------------------------------
 # Upload Video
 # -------------------------------
 def upload_video_to_yt(file_path, title, description="", tags=None,
                        category_id="22", privacy_status="private",
-                       made_for_kids=False):
+                       made_for_kids=False, chunk_mb=None):
+    # googleapiclient is only imported once an upload actually happens
+    HttpError = load("googleapiclient.errors").HttpError
+    MediaFileUpload = load("googleapiclient.http").MediaFileUpload
 
     try:
         # Check if video exists
@@ -97,20 +389,24 @@ def upload_video_to_yt(file_path, title, description="", tags=None,
             }
         }
 
-        media = MediaFileUpload(file_path, chunksize=-1, resumable=True)
+        chunk_size = aligned_chunk_size(chunk_mb)
+        media = MediaFileUpload(file_path, chunksize=chunk_size, resumable=True)
 
         request = youtube.videos().insert(
             part="snippet,status",
             body=body,
             media_body=media
         )
+        point_at_endpoint(request)
 
-        print("🚀 Starting upload...")
-        response = None
-        while response is None:
-            status, response = request.next_chunk()
-            if status:
-                print(f"Uploading... {int(status.progress() * 100)}%")
+        print(f"🚀 Starting upload ({chunk_size / (1024 * 1024):g} MB chunks)...")
+        with span("youtube_upload", "upload") as span_args:
+            response, sent, elapsed = run_resumable_upload(
+                request, upload_state_path(file_path, body),
+                os.path.getsize(file_path), HttpError
+            )
+            span_args.update({"bytes_sent": sent,
+                              "mb_per_s": round(sent / elapsed / 1e6, 3) if elapsed > 0 else None})
 
         print(f"\n✅ Video uploaded: https://www.youtube.com/watch?v={response['id']}")
         return response